@@ -1,6 +1,6 @@
 """
 SmartTrip AI - Backend API Server
-Flask implementation of the architecture spec's API layer.
+FastAPI (ASGI) implementation of the architecture spec's API layer.
 
 Endpoints:
     POST /api/optimize         — Optimize itinerary (core endpoint)
@@ -11,19 +11,29 @@ Endpoints:
     GET  /api/health           — Health check
     GET  /api/cache/stats      — Cache statistics
 
+Run:
+    WEB_CONCURRENCY=$((2 * $(nproc))) uvicorn api.app:app --loop uvloop --http httptools
+
+    Each worker's optimizer pool gets nproc / WEB_CONCURRENCY processes
+    (at least one); set SMARTTRIP_OPT_WORKERS to override.
+
 Production migration:
-    Replace Flask with FastAPI, swap CacheStore with Redis,
-    swap SQLite/CSV with PostgreSQL. All business logic stays identical.
+    Swap CacheStore with Redis, swap SQLite/CSV with PostgreSQL.
+    All business logic stays identical.
 """
 
-from functools import wraps
-from dataclasses import asdict
-from datetime import datetime, date
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, time as dt_time
+from functools import lru_cache, partial
+from typing import Annotated, Dict, Optional, Tuple
+import asyncio
 import time
-import json
 import os
 import sys
-from flask import Flask, request, jsonify
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from engine.data_loader import get_data_store
 from engine.travel_estimator import estimate_travel_time
 from engine.optimizer import optimize_itinerary
@@ -31,10 +41,9 @@ from api.cache import (
     get_cache, traffic_cache_key, weather_cache_key, optimize_cache_key
 )
 from api.schemas import (
-    OptimizeRequest, TrafficEstimateRequest, to_dict
+    OptimizeRequest, TrafficEstimateRequest, ORJSONResponse, to_dict,
+    INT_TO_CITY, INT_TO_DAY_TYPE, INT_TO_MODE,
 )
-from fastapi import FastAPI
-app = FastAPI()
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -43,90 +52,143 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # APP SETUP
 # ═══════════════════════════════════════════════════════════
 
-app = Flask(__name__)
-app.config["JSON_SORT_KEYS"] = False
-
 VERSION = "1.0.0-mvp"
 SUPPORTED_CITIES = ["madrid", "barcelona", "seville"]
+_SUPPORTED_CITY_SET = frozenset(SUPPORTED_CITIES)
+
+# Query-string city name -> canonical dataset city name
+_CITY_MAP = {
+    "madrid": "Madrid", "barcelona": "Barcelona", "seville": "Seville",
+    "sevilla": "Seville",
+}
+
+
+@lru_cache(maxsize=256)
+def _normalize_city(city: str) -> Optional[str]:
+    return _CITY_MAP.get(city.strip().lower())
 
-# Initialize data store on first request
-_initialized = False
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per server worker process: load the data store before
+    # accepting requests, and sweep idle rate-limit buckets while serving.
+    # The optimizer pool lives exactly as long as the lifespan, and reaches
+    # handlers as request.state.opt_pool.
+    get_data_store()
+    sweep_task = asyncio.create_task(_sweep_rate_limiter())
+    opt_pool = ProcessPoolExecutor(max_workers=_OPT_WORKERS, initializer=get_data_store)
+    try:
+        yield {"opt_pool": opt_pool}
+    finally:
+        opt_pool.shutdown(cancel_futures=True)
+        sweep_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweep_task
 
 
-def ensure_initialized():
-    global _initialized
-    if not _initialized:
-        get_data_store()
-        _initialized = True
+app = FastAPI(
+    title="SmartTrip AI API", version=VERSION,
+    default_response_class=ORJSONResponse, lifespan=lifespan,
+)
 
+# Optimizer runs are CPU-bound and take up to seconds; run them in worker
+# processes (each with its own pre-warmed data store) so N concurrent
+# optimize requests use N cores instead of contending for the GIL. Every
+# uvicorn worker holds its own pool, so the cores are split between them.
+_OPT_WORKERS = int(os.environ.get(
+    "SMARTTRIP_OPT_WORKERS",
+    max(1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY", 1)))))
 
 # ── Rate Limiter (simple in-memory) ──────────────────────
 
 class RateLimiter:
+    """Per-IP token bucket: refills max_requests tokens every window_seconds."""
+
     def __init__(self, max_requests: int = 60, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window = window_seconds
-        self._requests: dict = {}
+        self._rate = max_requests / window_seconds
+        # client_ip -> (tokens, last_refill)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
 
     def is_allowed(self, client_ip: str) -> bool:
-        now = time.time()
-        if client_ip not in self._requests:
-            self._requests[client_ip] = []
-
-        # Clean old entries
-        self._requests[client_ip] = [
-            t for t in self._requests[client_ip] if now - t < self.window
-        ]
+        now = time.monotonic()
+        tokens, last = self._buckets.get(client_ip, (self.max_requests, now))
+        tokens = min(self.max_requests, tokens + (now - last) * self._rate)
 
-        if len(self._requests[client_ip]) >= self.max_requests:
+        if tokens < 1:
+            self._buckets[client_ip] = (tokens, now)
             return False
 
-        self._requests[client_ip].append(now)
+        self._buckets[client_ip] = (tokens - 1, now)
         return True
 
+    def sweep(self):
+        """Drop buckets idle long enough to have fully refilled."""
+        cutoff = time.monotonic() - 2 * self.window
+        idle = [ip for ip, (_, last) in self._buckets.items() if last < cutoff]
+        for ip in idle:
+            del self._buckets[ip]
+
 
 rate_limiter = RateLimiter(max_requests=60, window_seconds=60)
 
 
-def rate_limit(f):
-    """Rate limiting decorator."""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        client_ip = request.remote_addr or "unknown"
-        if not rate_limiter.is_allowed(client_ip):
-            return jsonify({
-                "success": False,
-                "error": "Rate limit exceeded. Max 60 requests per minute.",
-                "code": 429
-            }), 429
-        return f(*args, **kwargs)
-    return decorated
+async def _sweep_rate_limiter():
+    while True:
+        await asyncio.sleep(rate_limiter.window)
+        rate_limiter.sweep()
+
+
+def error_response(message: str, status_code: int = 400, **extra) -> ORJSONResponse:
+    """Build the standard {success: False, error: ...} payload."""
+    return ORJSONResponse({"success": False, "error": message, **extra}, status_code=status_code)
+
+
+def rate_limit(request: Request):
+    """Rate limiting dependency."""
+    client_ip = request.client.host if request.client else "unknown"
+    if not rate_limiter.is_allowed(client_ip):
+        raise StarletteHTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Max 60 requests per minute.",
+        )
 
 
 # ── Error Handlers ───────────────────────────────────────
 
-@app.errorhandler(404)
-def not_found(e):
-    return jsonify({"success": False, "error": "Endpoint not found", "code": 404}), 404
+_HTTP_ERRORS = {
+    404: "Endpoint not found",
+    405: "Method not allowed",
+}
 
 
-@app.errorhandler(405)
-def method_not_allowed(e):
-    return jsonify({"success": False, "error": "Method not allowed", "code": 405}), 405
+@app.exception_handler(StarletteHTTPException)
+async def http_error(request: Request, exc: StarletteHTTPException):
+    message = _HTTP_ERRORS.get(exc.status_code, exc.detail)
+    return error_response(message, exc.status_code, code=exc.status_code)
 
 
-@app.errorhandler(500)
-def internal_error(e):
-    return jsonify({"success": False, "error": "Internal server error", "code": 500}), 500
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    details = []
+    for e in exc.errors():
+        field = ".".join(str(p) for p in e["loc"][1:])
+        details.append(f"{field}: {e['msg']}" if field else e["msg"])
+    return error_response(f"Invalid parameters: {'; '.join(details)}", 400, code=400)
+
+
+@app.exception_handler(Exception)
+async def internal_error(request: Request, exc: Exception):
+    return error_response("Internal server error", 500, code=500)
 
 
 # ═══════════════════════════════════════════════════════════
 # POST /api/optimize — Core Optimization Endpoint
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/optimize", methods=["POST"])
-@rate_limit
-def optimize():
+@app.post("/api/optimize", dependencies=[Depends(rate_limit)])
+async def optimize(req: OptimizeRequest, request: Request):
     """
     Optimize itinerary for given attractions.
 
@@ -138,31 +200,8 @@ def optimize():
         preference_mode: str (comfort|fastest|balanced)
         start_hour: int (0-23, default 9)
     """
-    ensure_initialized()
     t_start = time.perf_counter()
 
-    # Parse request
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({"success": False, "error": "Request body must be JSON"}), 400
-
-    try:
-        req = OptimizeRequest(
-            start_latitude=float(data.get("start_latitude", 0)),
-            start_longitude=float(data.get("start_longitude", 0)),
-            date=data.get("date", ""),
-            attraction_ids=data.get("attraction_ids", []),
-            preference_mode=data.get("preference_mode", "balanced"),
-            start_hour=int(data.get("start_hour", 9)),
-        )
-    except (TypeError, ValueError) as e:
-        return jsonify({"success": False, "error": f"Invalid input: {str(e)}"}), 400
-
-    # Validate
-    error = req.validate()
-    if error:
-        return jsonify({"success": False, "error": error}), 400
-
     # Check cache
     cache = get_cache()
     cache_key = optimize_cache_key(
@@ -173,7 +212,7 @@ def optimize():
     cached = cache.get(cache_key)
     if cached:
         cached["_cached"] = True
-        return jsonify(cached), 200
+        return ORJSONResponse(cached)
 
     # Determine city from attraction IDs
     store = get_data_store()
@@ -185,23 +224,22 @@ def optimize():
             break
 
     if not city:
-        return jsonify({"success": False, "error": "No valid attraction IDs found"}), 400
+        return error_response("No valid attraction IDs found")
 
-    # Parse date
-    try:
-        visit_date = datetime.fromisoformat(req.date)
-    except ValueError:
-        return jsonify({"success": False, "error": "Invalid date format"}), 400
+    visit_date = datetime.combine(req.date, dt_time(req.start_hour))
 
-    # Run optimizer
+    # Run optimizer in the process pool so other requests keep flowing
+    loop = asyncio.get_running_loop()
     try:
-        result = optimize_itinerary(
+        result = await loop.run_in_executor(request.state.opt_pool, partial(
+            optimize_itinerary,
             req.start_latitude, req.start_longitude,
             req.attraction_ids, city, visit_date,
-            req.start_hour, req.preference_mode
-        )
+            req.start_hour, INT_TO_MODE[req.preference_mode],
+            keep_all_scores=False,  # never sent, so don't pickle it back
+        ))
     except Exception as e:
-        return jsonify({"success": False, "error": f"Optimization failed: {str(e)}"}), 500
+        return error_response(f"Optimization failed: {str(e)}", 500)
 
     response = result.to_dict()
     response["success"] = True
@@ -211,16 +249,20 @@ def optimize():
     # Cache result (15 min TTL)
     cache.set(cache_key, response)
 
-    return jsonify(response), 200
+    return ORJSONResponse(response)
 
 
 # ═══════════════════════════════════════════════════════════
 # GET /api/attractions — List Attractions
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/attractions", methods=["GET"])
-@rate_limit
-def list_attractions():
+@app.get("/api/attractions", dependencies=[Depends(rate_limit)])
+async def list_attractions(
+    city: str = "",
+    category: str = "",
+    min_priority: Optional[float] = None,
+    limit: int = 50,
+):
     """
     List attractions for a city.
 
@@ -230,78 +272,48 @@ def list_attractions():
         min_priority: float (optional) — minimum priority score
         limit: int (optional) — max results (default 50)
     """
-    ensure_initialized()
     store = get_data_store()
 
-    city = request.args.get("city", "").strip()
-    if not city:
-        return jsonify({"success": False, "error": "city parameter is required"}), 400
+    if not city.strip():
+        return error_response("city parameter is required")
 
-    # Normalize city name
-    city_map = {
-        "madrid": "Madrid", "barcelona": "Barcelona", "seville": "Seville",
-        "sevilla": "Seville",
-    }
-    city_normalized = city_map.get(city.lower())
+    city_normalized = _normalize_city(city)
     if not city_normalized:
-        return jsonify({
-            "success": False,
-            "error": f"Unsupported city. Choose from: {list(city_map.keys())}"
-        }), 400
+        return error_response(f"Unsupported city. Choose from: {list(_CITY_MAP)}")
 
-    attractions = store.get_attractions_by_city(city_normalized)
+    attractions = store.get_top_attractions(
+        city_normalized, category.strip(), min_priority, limit)
 
-    # Apply filters
-    category = request.args.get("category", "").strip().lower()
-    if category:
-        attractions = [a for a in attractions if a.get(
-            "category", "").lower() == category]
-
-    min_priority = request.args.get("min_priority", type=float)
-    if min_priority is not None:
-        attractions = [a for a in attractions if a.get(
-            "priority_score", 0) >= min_priority]
-
-    # Sort by priority descending
-    attractions.sort(key=lambda a: a.get("priority_score", 0), reverse=True)
-
-    # Limit
-    limit = request.args.get("limit", 50, type=int)
-    attractions = attractions[:limit]
-
-    return jsonify({
+    return ORJSONResponse({
         "success": True,
         "city": city_normalized,
         "count": len(attractions),
         "attractions": attractions,
-    }), 200
+    })
 
 
 # ═══════════════════════════════════════════════════════════
-# GET /api/attractions/<id> — Get Single Attraction
+# GET /api/attractions/{id} — Get Single Attraction
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/attractions/<attraction_id>", methods=["GET"])
-@rate_limit
-def get_attraction(attraction_id):
+@app.get("/api/attractions/{attraction_id}", dependencies=[Depends(rate_limit)])
+async def get_attraction(attraction_id: str):
     """Get a single attraction by ID."""
-    ensure_initialized()
     store = get_data_store()
 
     attr = store.get_attraction(attraction_id)
     if not attr:
-        return jsonify({"success": False, "error": "Attraction not found"}), 404
+        return error_response("Attraction not found", 404)
 
-    return jsonify({"success": True, "attraction": attr}), 200
+    return ORJSONResponse({"success": True, "attraction": attr})
 
 
 # ═══════════════════════════════════════════════════════════
 # GET /api/traffic-estimate — Travel Time Estimation
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/traffic-estimate", methods=["GET"])
-@rate_limit
-def traffic_estimate():
+@app.get("/api/traffic-estimate", dependencies=[Depends(rate_limit)])
+async def traffic_estimate(req: Annotated[TrafficEstimateRequest, Query()]):
     """
     Estimate travel time between two points.
 
@@ -313,26 +325,6 @@ def traffic_estimate():
         day_type: str (optional, weekday|weekend, default weekday)
         month: int (optional, default 6)
     """
-    ensure_initialized()
-
-    try:
-        req = TrafficEstimateRequest(
-            origin_lat=float(request.args.get("origin_lat", 0)),
-            origin_lon=float(request.args.get("origin_lon", 0)),
-            dest_lat=float(request.args.get("dest_lat", 0)),
-            dest_lon=float(request.args.get("dest_lon", 0)),
-            city=request.args.get("city", ""),
-            hour=int(request.args.get("hour", 12)),
-            day_type=request.args.get("day_type", "weekday"),
-            month=int(request.args.get("month", 6)),
-        )
-    except (TypeError, ValueError) as e:
-        return jsonify({"success": False, "error": f"Invalid parameters: {e}"}), 400
-
-    error = req.validate()
-    if error:
-        return jsonify({"success": False, "error": error}), 400
-
     # Check cache
     cache = get_cache()
     cache_key = traffic_cache_key(
@@ -343,12 +335,12 @@ def traffic_estimate():
     cached = cache.get(cache_key)
     if cached:
         cached["_cached"] = True
-        return jsonify(cached), 200
+        return ORJSONResponse(cached)
 
     result = estimate_travel_time(
         req.origin_lat, req.origin_lon,
         req.dest_lat, req.dest_lon,
-        req.city, req.hour, req.day_type, req.month
+        INT_TO_CITY[req.city], req.hour, INT_TO_DAY_TYPE[req.day_type], req.month
     )
 
     response = {
@@ -358,16 +350,15 @@ def traffic_estimate():
     }
 
     cache.set(cache_key, response)
-    return jsonify(response), 200
+    return ORJSONResponse(response)
 
 
 # ═══════════════════════════════════════════════════════════
 # GET /api/weather-estimate — Weather & Heat Forecast
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/weather-estimate", methods=["GET"])
-@rate_limit
-def weather_estimate():
+@app.get("/api/weather-estimate", dependencies=[Depends(rate_limit)])
+async def weather_estimate(city: str = "", month: int = 0, hour: Optional[int] = None):
     """
     Get hourly weather/heat discomfort for a city and month.
 
@@ -376,109 +367,89 @@ def weather_estimate():
         month: int (required, 1-12)
         hour: int (optional) — if provided, returns single hour; otherwise all 24
     """
-    ensure_initialized()
     store = get_data_store()
 
-    city = request.args.get("city", "").strip().lower()
-    if not city or city not in SUPPORTED_CITIES:
-        return jsonify({
-            "success": False,
-            "error": f"city must be one of: {SUPPORTED_CITIES}"
-        }), 400
-
-    try:
-        month = int(request.args.get("month", 0))
-    except ValueError:
-        return jsonify({"success": False, "error": "month must be an integer"}), 400
+    city = city.strip().lower()
+    if city not in _SUPPORTED_CITY_SET:
+        return error_response(f"city must be one of: {SUPPORTED_CITIES}")
 
     if not (1 <= month <= 12):
-        return jsonify({"success": False, "error": "month must be between 1 and 12"}), 400
+        return error_response("month must be between 1 and 12")
 
-    hour_param = request.args.get("hour")
-
-    if hour_param is not None:
+    if hour is not None:
         # Single hour
-        try:
-            hour = int(hour_param)
-        except ValueError:
-            return jsonify({"success": False, "error": "hour must be an integer"}), 400
-
-        weather = store.get_weather(city, month, hour)
-        return jsonify({
+        weather = await store.aget_weather(city, month, hour)
+        return ORJSONResponse({
             "success": True,
             "city": city,
             "month": month,
             "hour": hour,
             "temperature_c": weather["temperature"],
             "heat_discomfort_index": weather["heat_discomfort"],
-        }), 200
+        })
     else:
-        # Full day profile
-        hours = []
-        for h in range(24):
-            w = store.get_weather(city, month, h)
-            hours.append({
-                "hour": h,
-                "temperature_c": w["temperature"],
-                "heat_discomfort_index": w["heat_discomfort"],
-            })
-
-        return jsonify({
+        # Full day profile in one batched lookup
+        day = (await store.aget_weather_day(city, month)).tolist()
+        hours = [
+            {"hour": h, "temperature_c": temp, "heat_discomfort_index": heat}
+            for h, (temp, heat) in enumerate(day)
+        ]
+
+        return ORJSONResponse({
             "success": True,
             "city": city,
             "month": month,
             "hours": hours,
-        }), 200
+        })
 
 
 # ═══════════════════════════════════════════════════════════
 # GET /api/health — Health Check
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/health", methods=["GET"])
-def health():
+@app.get("/api/health")
+async def health():
     """Health check endpoint."""
-    ensure_initialized()
     store = get_data_store()
     cache = get_cache()
 
-    return jsonify({
+    return ORJSONResponse({
         "status": "healthy",
         "version": VERSION,
         "attractions_loaded": len(store.attractions_by_id),
         "cities": SUPPORTED_CITIES,
         "cache_stats": cache.stats,
-    }), 200
+    })
 
 
 # ═══════════════════════════════════════════════════════════
 # GET /api/cache/stats — Cache Statistics
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/api/cache/stats", methods=["GET"])
-def cache_stats():
+@app.get("/api/cache/stats")
+async def cache_stats():
     """Return cache hit/miss statistics."""
     cache = get_cache()
-    return jsonify({"success": True, "cache": cache.stats}), 200
+    return ORJSONResponse({"success": True, "cache": cache.stats})
 
 
-@app.route("/api/cache/clear", methods=["POST"])
-def cache_clear():
+@app.post("/api/cache/clear")
+async def cache_clear():
     """Clear all cached entries."""
     cache = get_cache()
     cache.clear()
-    return jsonify({"success": True, "message": "Cache cleared"}), 200
+    return ORJSONResponse({"success": True, "message": "Cache cleared"})
 
 
 # ═══════════════════════════════════════════════════════════
 # ROOT / API DOCS
 # ═══════════════════════════════════════════════════════════
 
-@app.route("/", methods=["GET"])
-@app.route("/api", methods=["GET"])
-def api_docs():
+@app.get("/")
+@app.get("/api")
+async def api_docs():
     """API documentation endpoint."""
-    return jsonify({
+    return ORJSONResponse({
         "name": "SmartTrip AI API",
         "version": VERSION,
         "description": "Intelligent itinerary optimization for Spain tourism",
@@ -517,7 +488,7 @@ def api_docs():
             },
         },
         "supported_cities": SUPPORTED_CITIES,
-    }), 200
+    })
 
 
 # ═══════════════════════════════════════════════════════════
@@ -525,6 +496,9 @@ def api_docs():
 # ═══════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
+    import uvicorn
+
     print(f"SmartTrip AI API v{VERSION}")
     print(f"Starting server on http://localhost:5000")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # "auto" picks uvloop + httptools when they are installed
+    uvicorn.run("api.app:app", host="0.0.0.0", port=5000, loop="auto", http="auto")
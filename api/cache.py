@@ -8,61 +8,141 @@ Architecture spec: "Cache traffic/weather results for 15 minutes"
 import time
 import hashlib
 import json
-from typing import Any, Optional
+import struct
+import xxhash
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
 
 
 class CacheStore:
-    """Simple in-memory TTL cache. Replace with Redis in production."""
-
-    def __init__(self, default_ttl: int = 900):
+    """
+    In-memory TTL cache with an LRU size bound. Replace with Redis in production.
+
+    Optionally applies a bucketed access-frequency admission policy: a key is
+    only stored once it has been requested at least `admit_after` times within
+    the last `admit_window_min` minutes, so one-shot queries don't evict hot
+    entries.
+    """
+
+    def __init__(
+        self,
+        default_ttl: int = 900,
+        max_entries: int = 10_000,
+        admit_after: int = 1,
+        admit_window_min: int = 10,
+    ):
         """
         Args:
             default_ttl: Default time-to-live in seconds (900 = 15 minutes)
+            max_entries: LRU bound; least recently used entries are evicted beyond it
+            admit_after: Requests within the window needed before a key is stored
+                         (1 = store on first set)
+            admit_window_min: Admission window length in 1-minute buckets
         """
-        self._store: dict = {}
+        # key -> (expires_at, value), expires_at on the time.monotonic() clock
+        self._store: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
         self._default_ttl = default_ttl
+        self._max_entries = max_entries
+        self._admit_after = admit_after
+        self._admit_window = admit_window_min
+        # key -> deque of [minute_bucket, count], oldest bucket first; least
+        # recently requested key first, bounded like the store itself
+        self._access: "OrderedDict[Hashable, Deque[List[int]]]" = OrderedDict()
         self._hits = 0
         self._misses = 0
+        self._evictions = 0
 
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """Get a value from cache. Returns None if not found or expired."""
         entry = self._store.get(key)
         if entry is None:
             self._misses += 1
+            if self._admit_after > 1:
+                self._record_access(key)
             return None
 
-        if time.time() > entry["expires_at"]:
+        if entry[0] < time.monotonic():
             del self._store[key]
             self._misses += 1
+            if self._admit_after > 1:
+                self._record_access(key)
             return None
 
+        self._store.move_to_end(key)
         self._hits += 1
-        return entry["value"]
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None):
+        """Set a value in cache with TTL (subject to the admission policy)."""
+        if self._admit_after > 1 and key not in self._store:
+            if self._access_count(key) < self._admit_after:
+                return
+            self._access.pop(key, None)
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set a value in cache with TTL."""
         ttl = ttl or self._default_ttl
-        self._store[key] = {
-            "value": value,
-            "expires_at": time.time() + ttl,
-            "created_at": time.time(),
-        }
+        self._store[key] = (time.monotonic() + ttl, value)
+        self._store.move_to_end(key)
+        while len(self._store) > self._max_entries:
+            self._store.popitem(last=False)
+            self._evictions += 1
 
-    def delete(self, key: str):
+    def delete(self, key: Hashable):
         """Delete a key from cache."""
         self._store.pop(key, None)
+        self._access.pop(key, None)
 
     def clear(self):
         """Clear all cached entries."""
         self._store.clear()
+        self._access.clear()
 
     def cleanup(self):
-        """Remove expired entries."""
-        now = time.time()
-        expired = [k for k, v in self._store.items() if now > v["expires_at"]]
+        """Remove expired entries and stale access buckets."""
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._store.items() if now > expires_at]
         for k in expired:
             del self._store[k]
 
+        oldest = int(now // 60) - self._admit_window
+        stale = [k for k, buckets in self._access.items() if buckets[-1][0] <= oldest]
+        for k in stale:
+            del self._access[k]
+
+    # ── Admission policy (bucketed access counts) ──────────
+
+    def _record_access(self, key: Hashable):
+        minute = int(time.monotonic() // 60)
+        oldest = minute - self._admit_window
+        buckets = self._access.get(key)
+        if buckets is None:
+            buckets = self._access[key] = deque()
+        else:
+            self._access.move_to_end(key)
+        if buckets and buckets[-1][0] == minute:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([minute, 1])
+        while buckets[0][0] <= oldest:
+            buckets.popleft()
+
+        # Least recently requested keys come first: drop those whose window
+        # has passed, then any beyond the bound, so one-shot keys can't pile up
+        while self._access:
+            first_key, first = next(iter(self._access.items()))
+            if first[-1][0] > oldest and len(self._access) <= self._max_entries:
+                break
+            del self._access[first_key]
+
+    def _access_count(self, key: Hashable) -> int:
+        buckets = self._access.get(key)
+        if not buckets:
+            return 0
+        oldest = int(time.monotonic() // 60) - self._admit_window
+        count = sum(count for minute, count in buckets if minute > oldest)
+        if not count:
+            del self._access[key]
+        return count
+
     @property
     def stats(self) -> dict:
         """Return cache statistics."""
@@ -70,25 +150,44 @@ class CacheStore:
         total = self._hits + self._misses
         return {
             "entries": len(self._store),
+            "max_entries": self._max_entries,
+            "evictions": self._evictions,
             "hits": self._hits,
             "misses": self._misses,
             "hit_rate": round(self._hits / total, 3) if total > 0 else 0,
         }
 
     @staticmethod
-    def make_key(*args) -> str:
-        """Generate a cache key from arguments."""
+    def make_key(*args) -> tuple:
+        """Generate a cache key from arguments (the argument tuple itself)."""
+        return args
+
+    @staticmethod
+    def make_stable_key(*args) -> str:
+        """Stable string key for external stores (Redis) that need str keys."""
         raw = json.dumps(args, sort_keys=True, default=str)
         return hashlib.md5(raw.encode()).hexdigest()
 
 
 # ── Cache Key Builders ────────────────────────────────────
 
+# Key-family tag bytes keep packed keys from different families apart
+_TAG_TRAFFIC = 1
+
+# tag, origin lat/lon, dest lat/lon, hour, month, city id, day_type id
+_PACK_TRAFFIC = struct.Struct("<BddddBBBB").pack
+
+
 def traffic_cache_key(origin_lat, origin_lon, dest_lat, dest_lon, city, hour, day_type, month):
-    return CacheStore.make_key("traffic",
-                               round(origin_lat, 4), round(origin_lon, 4),
-                               round(dest_lat, 4), round(dest_lon, 4),
-                               city, hour, day_type, month)
+    """
+    Packed-struct key hashed with xxh3 to a single int (hot path: no str/JSON work).
+    city and day_type are the small-int enums from api.schemas.
+    """
+    return xxhash.xxh3_64_intdigest(
+        _PACK_TRAFFIC(_TAG_TRAFFIC,
+                      round(origin_lat, 4), round(origin_lon, 4),
+                      round(dest_lat, 4), round(dest_lon, 4),
+                      hour, month, city, day_type))
 
 
 def weather_cache_key(city, month, hour):
@@ -96,9 +195,10 @@ def weather_cache_key(city, month, hour):
 
 
 def optimize_cache_key(start_lat, start_lon, attraction_ids, city, date_str, start_hour, preference_mode):
+    """attraction_ids must already be canonical (sorted tuple, see OptimizeRequest)."""
     return CacheStore.make_key("optimize",
                                round(start_lat, 4), round(start_lon, 4),
-                               sorted(attraction_ids), city, date_str, start_hour, preference_mode)
+                               attraction_ids, city, date_str, start_hour, preference_mode)
 
 
 # Singleton
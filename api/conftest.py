@@ -0,0 +1,4 @@
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "serial: depends on shared cache state; run without xdist"
+    )
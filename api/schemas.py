@@ -2,46 +2,87 @@
 SmartTrip AI - API Schemas
 Request/response models for all endpoints.
 Mirrors the architecture doc's API contract exactly.
+
+Request models are Pydantic so FastAPI parses and validates them in one pass
+(errors surface as 400s via the app's RequestValidationError handler).
 """
 
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
-from datetime import date
+from dataclasses import dataclass, field, is_dataclass
+from enum import IntEnum
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import date, datetime
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel, Field, field_validator
+
+
+# ═══════════════════════════════════════════════════════════
+# Enum-like request fields, interned to small ints at parse time
+# ═══════════════════════════════════════════════════════════
+
+class City(IntEnum):
+    MADRID = 0
+    BARCELONA = 1
+    SEVILLE = 2
+
+
+class PreferenceMode(IntEnum):
+    COMFORT = 0
+    FASTEST = 1
+    BALANCED = 2
+
+
+class DayType(IntEnum):
+    WEEKDAY = 0
+    WEEKEND = 1
+
+
+# Enum value -> string used by the engine and in responses
+INT_TO_CITY = tuple(m.name.lower() for m in City)
+INT_TO_MODE = tuple(m.name.lower() for m in PreferenceMode)
+INT_TO_DAY_TYPE = tuple(m.name.lower() for m in DayType)
+
+_ALIASES = {City: {"sevilla": City.SEVILLE}}
+
+
+def _parse_enum(enum_cls, value):
+    """Coerce a case-insensitive name (or alias) to its IntEnum member."""
+    if not isinstance(value, str):
+        return value
+    name = value.strip().lower()
+    member = _ALIASES.get(enum_cls, {}).get(name)
+    if member is not None:
+        return member
+    try:
+        return enum_cls[name.upper()]
+    except KeyError:
+        choices = ", ".join(m.name.lower() for m in enum_cls)
+        raise ValueError(f"must be one of: {choices}")
 
 
 # ═══════════════════════════════════════════════════════════
 # POST /api/optimize — Request & Response
 # ═══════════════════════════════════════════════════════════
 
-@dataclass
-class OptimizeRequest:
+class OptimizeRequest(BaseModel):
     """POST /api/optimize input"""
-    start_latitude: float
-    start_longitude: float
-    date: str                           # ISO format: "2025-07-15"
-    attraction_ids: List[str]           # List of UUID strings
-    preference_mode: str = "balanced"   # comfort | fastest | balanced
-    start_hour: int = 9                 # Hour to start (0-23)
-
-    def validate(self) -> Optional[str]:
-        """Returns error message if invalid, None if valid."""
-        if not (-90 <= self.start_latitude <= 90):
-            return "start_latitude must be between -90 and 90"
-        if not (-180 <= self.start_longitude <= 180):
-            return "start_longitude must be between -180 and 180"
-        if not self.attraction_ids:
-            return "attraction_ids must not be empty"
-        if len(self.attraction_ids) > 7:
-            return "Maximum 7 attractions per itinerary"
-        if self.preference_mode not in ("comfort", "fastest", "balanced"):
-            return "preference_mode must be comfort, fastest, or balanced"
-        if not (0 <= self.start_hour <= 23):
-            return "start_hour must be between 0 and 23"
-        try:
-            date.fromisoformat(self.date)
-        except (ValueError, TypeError):
-            return "date must be in ISO format (YYYY-MM-DD)"
-        return None
+    start_latitude: float = Field(ge=-90, le=90)
+    start_longitude: float = Field(ge=-180, le=180)
+    date: date                                      # ISO format: "2025-07-15"
+    attraction_ids: Tuple[str, ...] = Field(min_length=1, max_length=7)  # UUIDs, sorted + deduped
+    preference_mode: PreferenceMode = PreferenceMode.BALANCED   # comfort | fastest | balanced
+    start_hour: int = Field(default=9, ge=0, le=23)  # Hour to start (0-23)
+
+    @field_validator("attraction_ids")
+    @classmethod
+    def _canonical_ids(cls, v: Tuple[str, ...]) -> Tuple[str, ...]:
+        # Canonical order makes the request (and its cache key) order-independent
+        return tuple(sorted(set(v)))
+
+    @field_validator("preference_mode", mode="before")
+    @classmethod
+    def _mode(cls, v):
+        return _parse_enum(PreferenceMode, v)
 
 
 @dataclass
@@ -119,25 +160,26 @@ class AttractionsListResponse:
 # GET /api/traffic-estimate — Response
 # ═══════════════════════════════════════════════════════════
 
-@dataclass
-class TrafficEstimateRequest:
-    origin_lat: float
-    origin_lon: float
-    dest_lat: float
-    dest_lon: float
-    city: str
-    hour: int = 12
-    day_type: str = "weekday"
-    month: int = 6
+class TrafficEstimateRequest(BaseModel):
+    """GET /api/traffic-estimate query parameters"""
+    origin_lat: float = 0
+    origin_lon: float = 0
+    dest_lat: float = 0
+    dest_lon: float = 0
+    city: City
+    hour: int = Field(default=12, ge=0, le=23)
+    day_type: DayType = DayType.WEEKDAY
+    month: int = Field(default=6, ge=1, le=12)
+
+    @field_validator("city", mode="before")
+    @classmethod
+    def _city(cls, v):
+        return _parse_enum(City, v)
 
-    def validate(self) -> Optional[str]:
-        if not self.city:
-            return "city is required"
-        if not (0 <= self.hour <= 23):
-            return "hour must be between 0 and 23"
-        if self.day_type not in ("weekday", "weekend"):
-            return "day_type must be weekday or weekend"
-        return None
+    @field_validator("day_type", mode="before")
+    @classmethod
+    def _day_type(cls, v):
+        return _parse_enum(DayType, v)
 
 
 @dataclass
@@ -190,5 +232,32 @@ class ErrorResponse:
 
 
 def to_dict(obj) -> dict:
-    """Convert dataclass to dict."""
-    return asdict(obj)
+    """
+    Convert dataclass to dict. Shallow: nested lists/dicts are shared rather
+    than deep-copied as dataclasses.asdict would.
+    """
+    return dict(obj.__dict__) if is_dataclass(obj) else obj
+
+
+# ═══════════════════════════════════════════════════════════
+# JSON Serialization
+# ═══════════════════════════════════════════════════════════
+
+def _default(obj):
+    """orjson fallback for types it does not serialize natively."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if is_dataclass(obj):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered by orjson, bypassing FastAPI's jsonable_encoder."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
@@ -1,13 +1,21 @@
 """
 SmartTrip AI - Phase 3 API Test Suite
-Tests all endpoints using Flask's built-in test client (no server needed).
+Tests all endpoints using FastAPI's TestClient (no server needed).
+
+Run in two passes: independent tests in parallel, then the tests that
+depend on shared cache state on their own:
+    pytest -n auto -m "not serial" api/
+    pytest -m serial api/
 """
 
-from api.app import app
+import pytest
+from fastapi.testclient import TestClient
+from api.app import app, RateLimiter
+import api.app as app_module
+from types import SimpleNamespace
+from api.cache import CacheStore
 import sys
 import os
-import json
-import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -18,13 +26,18 @@ def separator(title):
     print(f"{'═'*70}")
 
 
-client = app.test_client()
+@pytest.fixture(scope="module")
+def client():
+    # Module-scoped: each xdist worker builds its own client once, and
+    # entering it runs the app's lifespan
+    with TestClient(app) as client:
+        yield client
 
 
-def test_health():
+def test_health(client):
     separator("TEST 1: GET /api/health")
     r = client.get("/api/health")
-    data = r.get_json()
+    data = r.json()
 
     assert r.status_code == 200
     assert data["status"] == "healthy"
@@ -37,10 +50,10 @@ def test_health():
     print("  PASSED ✓")
 
 
-def test_api_docs():
+def test_api_docs(client):
     separator("TEST 2: GET / (API Documentation)")
     r = client.get("/api")
-    data = r.get_json()
+    data = r.json()
 
     assert r.status_code == 200
     assert "endpoints" in data
@@ -50,12 +63,12 @@ def test_api_docs():
     print("  PASSED ✓")
 
 
-def test_attractions_list():
+def test_attractions_list(client):
     separator("TEST 3: GET /api/attractions")
 
     # Basic city query
     r = client.get("/api/attractions?city=madrid")
-    data = r.get_json()
+    data = r.json()
     assert r.status_code == 200
     assert data["success"]
     assert data["count"] > 20
@@ -73,32 +86,32 @@ def test_attractions_list():
 
     # Barcelona
     r = client.get("/api/attractions?city=barcelona")
-    data = r.get_json()
+    data = r.json()
     assert data["count"] > 20
     print(f"  ✓ Barcelona: {data['count']} attractions")
 
     # Seville
     r = client.get("/api/attractions?city=seville")
-    data = r.get_json()
+    data = r.json()
     assert data["count"] > 20
     print(f"  ✓ Seville: {data['count']} attractions")
 
     # Filter by category
     r = client.get("/api/attractions?city=madrid&category=indoor")
-    data = r.get_json()
+    data = r.json()
     assert data["count"] > 0
     assert all(a["category"] == "indoor" for a in data["attractions"])
     print(f"  ✓ Madrid indoor: {data['count']} attractions")
 
     # Filter by priority
     r = client.get("/api/attractions?city=barcelona&min_priority=9")
-    data = r.get_json()
+    data = r.json()
     assert all(a["priority_score"] >= 9.0 for a in data["attractions"])
     print(f"  ✓ Barcelona priority≥9: {data['count']} attractions")
 
     # Limit
     r = client.get("/api/attractions?city=madrid&limit=5")
-    data = r.get_json()
+    data = r.json()
     assert data["count"] == 5
     print(f"  ✓ Limit=5: returned {data['count']} attractions")
 
@@ -115,17 +128,17 @@ def test_attractions_list():
     print("  PASSED ✓")
 
 
-def test_attraction_by_id():
+def test_attraction_by_id(client):
     separator("TEST 4: GET /api/attractions/<id>")
 
     # Get a valid ID first
     r = client.get("/api/attractions?city=madrid&limit=1")
-    attraction = r.get_json()["attractions"][0]
+    attraction = r.json()["attractions"][0]
     aid = attraction["id"]
 
     # Fetch by ID
     r = client.get(f"/api/attractions/{aid}")
-    data = r.get_json()
+    data = r.json()
     assert r.status_code == 200
     assert data["success"]
     assert data["attraction"]["name"] == attraction["name"]
@@ -139,7 +152,7 @@ def test_attraction_by_id():
     print("  PASSED ✓")
 
 
-def test_traffic_estimate():
+def test_traffic_estimate(client):
     separator("TEST 5: GET /api/traffic-estimate")
 
     # Prado → Royal Palace (Madrid)
@@ -149,7 +162,7 @@ def test_traffic_estimate():
         "&dest_lat=40.4180&dest_lon=-3.7143"
         "&city=Madrid&hour=9&day_type=weekday&month=7"
     )
-    data = r.get_json()
+    data = r.json()
     assert r.status_code == 200
     assert data["success"]
     assert data["duration_minutes"] > 0
@@ -173,8 +186,8 @@ def test_traffic_estimate():
         "&dest_lat=40.4531&dest_lon=-3.6883"
         "&city=Madrid&hour=22&day_type=weekday&month=6"
     )
-    rush = r_rush.get_json()
-    off = r_off.get_json()
+    rush = r_rush.json()
+    off = r_off.json()
     assert rush["duration_minutes"] > off["duration_minutes"]
     print(
         f"  ✓ Rush(8AM)={rush['duration_minutes']}min > Off-peak(10PM)={off['duration_minutes']}min")
@@ -188,12 +201,12 @@ def test_traffic_estimate():
     print("  PASSED ✓")
 
 
-def test_weather_estimate():
+def test_weather_estimate(client):
     separator("TEST 6: GET /api/weather-estimate")
 
     # Single hour
     r = client.get("/api/weather-estimate?city=madrid&month=7&hour=14")
-    data = r.get_json()
+    data = r.json()
     assert r.status_code == 200
     assert data["success"]
     assert data["temperature_c"] > 30  # July 2PM in Madrid should be hot
@@ -203,7 +216,7 @@ def test_weather_estimate():
 
     # Full day profile
     r = client.get("/api/weather-estimate?city=seville&month=8")
-    data = r.get_json()
+    data = r.json()
     assert len(data["hours"]) == 24
     temps = [h["temperature_c"] for h in data["hours"]]
     max_temp = max(temps)
@@ -213,7 +226,7 @@ def test_weather_estimate():
 
     # Winter check
     r = client.get("/api/weather-estimate?city=madrid&month=1&hour=3")
-    data = r.get_json()
+    data = r.json()
     assert data["temperature_c"] < 10
     print(f"  ✓ Madrid Jan 3AM: {data['temperature_c']}°C (cold)")
 
@@ -227,12 +240,13 @@ def test_weather_estimate():
     print("  PASSED ✓")
 
 
-def test_optimize():
+@pytest.mark.serial
+def test_optimize(client):
     separator("TEST 7: POST /api/optimize")
 
     # Get 4 Madrid attractions
     r = client.get("/api/attractions?city=madrid&min_priority=9&limit=4")
-    attractions = r.get_json()["attractions"]
+    attractions = r.json()["attractions"]
     ids = [a["id"] for a in attractions]
     names = [a["name"] for a in attractions]
     print(f"  Selected: {', '.join(names)}")
@@ -247,7 +261,7 @@ def test_optimize():
         "start_hour": 9
     }
     r = client.post("/api/optimize", json=payload)
-    data = r.get_json()
+    data = r.json()
 
     assert r.status_code == 200
     assert data["success"]
@@ -266,7 +280,7 @@ def test_optimize():
 
     # Test caching — second call should be cached
     r2 = client.post("/api/optimize", json=payload)
-    data2 = r2.get_json()
+    data2 = r2.json()
     assert data2["_cached"] == True
     assert data2["total_impact_score"] == data["total_impact_score"]
     print(f"  ✓ Cache hit on repeated request")
@@ -274,11 +288,11 @@ def test_optimize():
     print("  PASSED ✓")
 
 
-def test_optimize_5_attractions():
+def test_optimize_5_attractions(client):
     separator("TEST 8: POST /api/optimize (5 attractions, Barcelona)")
 
     r = client.get("/api/attractions?city=barcelona&min_priority=9&limit=5")
-    attractions = r.get_json()["attractions"]
+    attractions = r.json()["attractions"]
     ids = [a["id"] for a in attractions]
 
     payload = {
@@ -290,7 +304,7 @@ def test_optimize_5_attractions():
         "start_hour": 9
     }
     r = client.post("/api/optimize", json=payload)
-    data = r.get_json()
+    data = r.json()
 
     assert data["permutations_evaluated"] == 120  # 5! = 120
     assert len(data["timeline"]) == 5
@@ -303,7 +317,7 @@ def test_optimize_5_attractions():
     print("  PASSED ✓")
 
 
-def test_optimize_errors():
+def test_optimize_errors(client):
     separator("TEST 9: POST /api/optimize — Error Handling")
 
     # Empty body
@@ -348,11 +362,12 @@ def test_optimize_errors():
     print("  PASSED ✓")
 
 
-def test_preference_comparison():
+@pytest.mark.serial
+def test_preference_comparison(client):
     separator("TEST 10: Preference Mode Comparison via API")
 
     r = client.get("/api/attractions?city=madrid&min_priority=9&limit=4")
-    ids = [a["id"] for a in r.get_json()["attractions"]]
+    ids = [a["id"] for a in r.json()["attractions"]]
 
     results = {}
     for mode in ["comfort", "balanced", "fastest"]:
@@ -367,7 +382,7 @@ def test_preference_comparison():
             "preference_mode": mode,
             "start_hour": 9
         })
-        data = r.get_json()
+        data = r.json()
         results[mode] = data
 
         route = [leg["attraction_name"][:20] for leg in data["timeline"]]
@@ -379,17 +394,18 @@ def test_preference_comparison():
     print("  PASSED ✓")
 
 
-def test_cache():
+@pytest.mark.serial
+def test_cache(client):
     separator("TEST 11: Cache Operations")
 
     # Clear
     r = client.post("/api/cache/clear")
-    assert r.get_json()["success"]
+    assert r.json()["success"]
     print(f"  ✓ Cache cleared")
 
     # Stats
     r = client.get("/api/cache/stats")
-    stats = r.get_json()["cache"]
+    stats = r.json()["cache"]
     assert stats["entries"] == 0
     print(f"  ✓ Cache empty: {stats}")
 
@@ -410,57 +426,120 @@ def test_cache():
         "&dest_lat=40.4180&dest_lon=-3.7143"
         "&city=Madrid&hour=9"
     )
-    data = r1.get_json()
+    data = r1.json()
     assert data.get("_cached") == True
     print(f"  ✓ Traffic estimate cached on second call")
 
     r = client.get("/api/cache/stats")
-    stats = r.get_json()["cache"]
+    stats = r.json()["cache"]
     print(f"  ✓ Cache stats: {stats}")
 
     print("  PASSED ✓")
 
 
-def test_404():
-    separator("TEST 12: Error Handling")
+def test_cache_store_bounds():
+    separator("TEST 12: Cache Eviction and Admission")
+
+    # LRU: a read refreshes a key, so the untouched one is evicted
+    cache = CacheStore(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats["evictions"] == 1
+    print(f"  ✓ Least recently used entry evicted")
+
+    # Admission: a key is stored once it has missed admit_after times
+    cache = CacheStore(admit_after=3, max_entries=100)
+    for _ in range(2):
+        assert cache.get("k") is None
+        cache.set("k", "v")
+    assert cache.get("k") is None
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert "k" not in cache._access
+    print(f"  ✓ Key admitted on its third miss")
+
+    cache.get("gone")
+    cache.delete("gone")
+    assert "gone" not in cache._access
+    print(f"  ✓ Delete drops access tracking")
+
+    # One-shot keys are never admitted, and their tracking stays bounded
+    for i in range(5_000):
+        cache.get(("one-shot", i))
+        cache.set(("one-shot", i), i)
+    assert len(cache._access) <= 100
+    assert cache.stats["entries"] == 1
+    print(f"  ✓ Access tracking bounded: {len(cache._access)} keys after 5000 misses")
 
-    r = client.get("/api/nonexistent")
-    assert r.status_code == 404
-    print(f"  ✓ Unknown endpoint → 404")
+    print("  PASSED ✓")
 
-    r = client.put("/api/optimize")
-    assert r.status_code == 405
-    print(f"  ✓ Wrong method → 405")
+
+def test_rate_limiter():
+    separator("TEST 13: Rate Limiter Token Bucket")
+
+    # Swap the clock the limiter reads, and only that module's
+    now = [1000.0]
+    app_time = app_module.time
+    app_module.time = SimpleNamespace(monotonic=lambda: now[0])
+    try:
+        limiter = RateLimiter(max_requests=3, window_seconds=60)
+        assert [limiter.is_allowed("a") for _ in range(4)] == [True, True, True, False]
+        assert limiter.is_allowed("b")
+        print(f"  ✓ Burst of max_requests allowed, then refused")
+
+        # One token refills every window / max_requests seconds
+        now[0] += 10
+        assert not limiter.is_allowed("a")
+        now[0] += 10
+        assert limiter.is_allowed("a") and not limiter.is_allowed("a")
+        print(f"  ✓ Tokens refill at max_requests per window")
+
+        # Buckets idle for two windows are swept; active ones are kept
+        now[0] += 100
+        limiter.is_allowed("a")
+        now[0] += 30
+        limiter.sweep()
+        assert set(limiter._buckets) == {"a"}
+        print(f"  ✓ Idle buckets swept")
+    finally:
+        app_module.time = app_time
 
     print("  PASSED ✓")
 
 
-# ═══════════════════════════════════════════════════════════
-# RUN ALL TESTS
-# ═══════════════════════════════════════════════════════════
+def test_optimize_across_lifespans():
+    separator("TEST 14: Optimizer Pool Across Lifespans")
 
-if __name__ == "__main__":
-    print("=" * 70)
-    print("  SmartTrip AI — Phase 3 API Test Suite")
-    print("=" * 70)
+    # Each startup gets its own pool, so a shutdown can't strand later requests
+    for hour in (10, 11):
+        with TestClient(app) as client:
+            ids = [a["id"] for a in client.get(
+                "/api/attractions?city=seville&limit=3").json()["attractions"]]
+            r = client.post("/api/optimize", json={
+                "start_latitude": 37.3891, "start_longitude": -5.9845,
+                "date": "2025-04-08", "attraction_ids": ids,
+                "preference_mode": "fastest", "start_hour": hour,
+            })
+            assert r.status_code == 200, r.json()
+            assert not r.json()["_cached"]
+            print(f"  ✓ Optimize served after startup #{hour - 9}")
 
-    t_start = time.perf_counter()
+    print("  PASSED ✓")
 
-    test_health()
-    test_api_docs()
-    test_attractions_list()
-    test_attraction_by_id()
-    test_traffic_estimate()
-    test_weather_estimate()
-    test_optimize()
-    test_optimize_5_attractions()
-    test_optimize_errors()
-    test_preference_comparison()
-    test_cache()
-    test_404()
 
-    t_total = (time.perf_counter() - t_start) * 1000
+def test_404(client):
+    separator("TEST 15: Error Handling")
 
-    separator(f"ALL 12 TESTS PASSED ✓✓✓  ({t_total:.0f}ms)")
-    print("  Phase 3 Backend & APIs: COMPLETE")
-    print(f"{'═'*70}\n")
+    r = client.get("/api/nonexistent")
+    assert r.status_code == 404
+    print(f"  ✓ Unknown endpoint → 404")
+
+    r = client.put("/api/optimize")
+    assert r.status_code == 405
+    print(f"  ✓ Wrong method → 405")
+
+    print("  PASSED ✓")
@@ -1,13 +1,28 @@
+from contextlib import asynccontextmanager
+
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
-from app.services.weather_forecast_service import pick_best_and_worst_time, geocode_place
+from app.services.weather_forecast_service import pick_best_and_worst_time, geocode_place, close_client
 
 load_dotenv()
 
-app = FastAPI(title="FlowIQ API", version="1.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The shared HTTP client is opened on first use and closed with the app
+    try:
+        yield
+    finally:
+        await close_client()
+
+
+app = FastAPI(title="FlowIQ API", version="1.1.0", default_response_class=ORJSONResponse,
+              lifespan=lifespan)
 
 # Preset city-center coordinates for dropdown support
 CITY_COORDS = {
@@ -16,12 +31,15 @@ CITY_COORDS = {
     "seville": (37.3891, -5.9845),
     "sevilla": (37.3891, -5.9845),
 }
+_CITY_CHOICES = sorted(CITY_COORDS)
 
 @app.get("/")
 def root():
     return {"status": "FlowIQ backend running"}
 
 class BestTimeRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
     # Provide either city OR lat/lon (lat/lon overrides city if present)
     city: Optional[str] = "barcelona"
     place: Optional[str] = None
@@ -29,48 +47,53 @@ class BestTimeRequest(BaseModel):
     lon: Optional[float] = None
     hours_ahead: int = 24
 
+# Finished best-time payloads; most traffic hits the same few city presets
+_BEST_TIME_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=300)
+
 @app.post("/weather/best-time")
-def weather_best_time(req: BestTimeRequest):
+async def weather_best_time(req: BestTimeRequest):
     # If lat/lon provided, use exact location
     if req.lat is not None and req.lon is not None:
-        result = pick_best_and_worst_time(
-            lat=req.lat,
-            lon=req.lon,
-            hours_ahead=req.hours_ahead,
-            label=req.city or "custom location"
-        )
+        lat, lon = req.lat, req.lon
+        label = req.city or "custom location"
     elif req.place:
-       geo = geocode_place(req.place, req.city)
-       result = pick_best_and_worst_time(
-           lat=geo["lat"],
-           lon=geo["lon"],
-           hours_ahead=req.hours_ahead,
-           label=geo["label"],
-       )
+        geo = await geocode_place(req.place, req.city)
+        lat, lon, label = geo["lat"], geo["lon"], geo["label"]
     else:
         # Otherwise use city preset
         if not req.city:
             raise HTTPException(status_code=400, detail="Provide either city or lat/lon")
 
-        key = req.city.strip().lower()
-        if key not in CITY_COORDS:
+        coords = CITY_COORDS.get(req.city.lower())
+        if coords is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported city '{req.city}'. Use one of: {sorted(set(CITY_COORDS.keys()))}"
+                detail=f"Unsupported city '{req.city}'. Use one of: {_CITY_CHOICES}"
             )
 
-        lat, lon = CITY_COORDS[key]
-        result = pick_best_and_worst_time(
-            lat=lat,
-            lon=lon,
-            hours_ahead=req.hours_ahead,
-            label=req.city
-        )
+        lat, lon = coords
+        label = req.city
+
+    cache_key = (round(lat, 3), round(lon, 3), req.hours_ahead, label)
+    result = _BEST_TIME_CACHE.get(cache_key)
+    if result is not None:
+        return ORJSONResponse(result)
+
+    result = await pick_best_and_worst_time(
+        lat=lat,
+        lon=lon,
+        hours_ahead=req.hours_ahead,
+        label=label,
+    )
 
     if not result:
         raise HTTPException(status_code=404, detail="Forecast unavailable")
 
-    return result
+    if "error" not in result and "error_from_openweather" not in result:
+        _BEST_TIME_CACHE[cache_key] = result
+    # Returned as a response so orjson serializes the datetimes directly
+    # instead of FastAPI's jsonable_encoder walking the dict first
+    return ORJSONResponse(result)
 # 🚀 ENGINE 2 API
 from backend.app.services.transport_service import get_transport_recommendations
 
@@ -87,3 +110,13 @@ def engine2_recommend(start: str, end: str):
         },
         "output": result
     }
+
+
+if __name__ == "__main__":
+    # Production: uvicorn app.main:app --loop uvloop --http httptools --workers $(nproc)
+    import os
+    import uvicorn
+
+    # "auto" picks uvloop + httptools when they are installed
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, loop="auto", http="auto",
+                workers=os.cpu_count() or 1)
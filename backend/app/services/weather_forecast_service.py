@@ -1,5 +1,10 @@
 import os
+import time
+from bisect import bisect_right
 import httpx
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, Optional, Tuple, List
 
@@ -7,11 +12,32 @@ from typing import Dict, Any, Optional, Tuple, List
 FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
 GEOCODE_URL = "https://api.openweathermap.org/geo/1.0/direct"
 
-# --- Scoring + messaging ------------------------------------------------------
+# OpenWeather refreshes forecasts roughly every 10 minutes; geocoding is static
+_FORECAST_CACHE: TTLCache = TTLCache(maxsize=512, ttl=600)
+_GEOCODE_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=24 * 3600)
+
+# One client per app lifespan so connections are reused across requests;
+# created on first use, so a new lifespan after close_client() gets a fresh one
+_HTTPX: Optional[httpx.AsyncClient] = None
+
+
+def _client() -> httpx.AsyncClient:
+    global _HTTPX
+    if _HTTPX is None or _HTTPX.is_closed:
+        _HTTPX = httpx.AsyncClient(
+            timeout=20,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _HTTPX
+
 
-def _clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
+async def close_client() -> None:
+    global _HTTPX
+    if _HTTPX is not None:
+        client, _HTTPX = _HTTPX, None
+        await client.aclose()
 
+# --- Scoring + messaging ------------------------------------------------------
 
 def weather_score(
     temp: float,
@@ -39,35 +65,59 @@ def weather_score(
     score -= max(0, humidity - 60) * 0.5
 
     # Rain chance penalty (0..1)
-    score -= _clamp(pop, 0.0, 1.0) * 40.0
-
-    return int(_clamp(score, 0, 100))
+    score -= (pop if 0.0 <= pop <= 1.0 else (0.0 if pop < 0.0 else 1.0)) * 40.0
+
+    return int(max(0, min(100, score)))
+
+
+def weather_scores(
+    feels_like: np.ndarray,
+    wind: np.ndarray,
+    humidity: np.ndarray,
+    pop: np.ndarray,
+) -> np.ndarray:
+    """Vectorized weather_score over arrays of forecast slots (pop pre-clamped to 0..1)."""
+    # Fused in place over two buffers instead of one temporary per term
+    score = np.subtract(feels_like, 21.0)
+    np.abs(score, out=score)
+    score *= -2.0
+    score += 100.0
+
+    tmp = np.multiply(wind, 1.5)
+    score -= tmp
+    np.subtract(humidity, 60, out=tmp)
+    np.maximum(tmp, 0.0, out=tmp)
+    tmp *= 0.5
+    score -= tmp
+    np.multiply(pop, 40.0, out=tmp)
+    score -= tmp
+
+    np.clip(score, 0, 100, out=score)
+    return score.astype(np.int32)
+
+
+# Tier i covers scores in [_BOUNDS[i-1], _BOUNDS[i]); bisect picks the tier
+_BOUNDS = (50, 70, 85)
+_RATINGS = ("Poor", "Okay", "Good", "Excellent")
+_VIBES = (
+    "Not ideal for outdoor plans—consider indoor activities.",
+    "Decent, but plan smart—some conditions may be annoying.",
+    "Great for exploring—minor weather discomfort possible.",
+    "Perfect for sightseeing and outdoor plans.",
+)
 
 
 def rating_fn(score: int) -> str:
-    if score >= 85:
-        return "Excellent"
-    if score >= 70:
-        return "Good"
-    if score >= 50:
-        return "Okay"
-    return "Poor"
+    return _RATINGS[bisect_right(_BOUNDS, score)]
 
 
 def make_sentence(feels_like: float, desc: str, pop: float, score: int) -> str:
-    rain_pct = int(round(_clamp(pop, 0.0, 1.0) * 100))
-    rating = rating_fn(score)
-
-    if score >= 85:
-        vibe = "Perfect for sightseeing and outdoor plans."
-    elif score >= 70:
-        vibe = "Great for exploring—minor weather discomfort possible."
-    elif score >= 50:
-        vibe = "Decent, but plan smart—some conditions may be annoying."
-    else:
-        vibe = "Not ideal for outdoor plans—consider indoor activities."
-
-    return f"{rating} weather: feels like {round(feels_like,1)}°C, {desc}, rain chance {rain_pct}%. {vibe}"
+    rain_pct = int(round(max(0.0, min(1.0, pop)) * 100))
+    tier = bisect_right(_BOUNDS, score)
+    return (
+        f"{_RATINGS[tier]} weather: feels like {round(feels_like,1)}°C, {desc}, "
+        f"rain chance {rain_pct}%. {_VIBES[tier]}"
+    )
 
 
 # --- OpenWeather fetch --------------------------------------------------------
@@ -79,7 +129,12 @@ def _require_key() -> str:
     return key
 
 
-def fetch_forecast_by_coords(lat: float, lon: float) -> Dict[str, Any]:
+async def fetch_forecast_by_coords(lat: float, lon: float) -> Dict[str, Any]:
+    cache_key = (round(lat, 2), round(lon, 2))
+    cached = _FORECAST_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     key = _require_key()
 
     params = {
@@ -89,19 +144,20 @@ def fetch_forecast_by_coords(lat: float, lon: float) -> Dict[str, Any]:
         "units": "metric",
     }
 
-    with httpx.Client(timeout=20) as client:
-        r = client.get(FORECAST_URL, params=params)
+    r = await _client().get(FORECAST_URL, params=params)
 
     if r.status_code != 200:
         # Return a helpful payload instead of crashing
         return {"error_from_openweather": r.text, "status_code": r.status_code}
 
-    return r.json()
+    data = orjson.loads(r.content)
+    _FORECAST_CACHE[cache_key] = data
+    return data
 
 
 # --- Main function used by app/main.py ----------------------------------------
 
-def geocode_place(place: str, city_hint: str | None = None) -> Dict[str, Any]:
+async def geocode_place(place: str, city_hint: str | None = None) -> Dict[str, Any]:
     key = _require_key()
     """
     Convert a place name into lat/lon using OpenWeather Geocoding API.
@@ -111,19 +167,23 @@ def geocode_place(place: str, city_hint: str | None = None) -> Dict[str, Any]:
     if city_hint:
         q = f"{q}, {city_hint}, ES"  # keep it focused on Spain
 
+    cache_key = q.lower()
+    cached = _GEOCODE_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     params = {
         "q": q,
         "limit": 1,
         "appid": key,        
     }
 
-    with httpx.Client(timeout=20) as client:
-        r = client.get(GEOCODE_URL, params=params)
+    r = await _client().get(GEOCODE_URL, params=params)
 
     if r.status_code != 200:
         raise RuntimeError(f"Geocode error: {r.status_code} {r.text}")
 
-    arr = r.json()
+    arr = orjson.loads(r.content)
     if not arr:
         raise RuntimeError(f"No geocode results for '{q}'")
 
@@ -141,8 +201,10 @@ def geocode_place(place: str, city_hint: str | None = None) -> Dict[str, Any]:
     if country:
         label += f", {country}"
 
-    return {"lat": lat, "lon": lon, "label": label}
-def pick_best_and_worst_time(
+    result = {"lat": lat, "lon": lon, "label": label}
+    _GEOCODE_CACHE[cache_key] = result
+    return result
+async def pick_best_and_worst_time(
     lat: float,
     lon: float,
     hours_ahead: int = 24,
@@ -154,77 +216,79 @@ def pick_best_and_worst_time(
     Returns:
       - best_time_utc, best_time_local, best_weather_score, best_summary (sentence)
       - worst_time_utc, worst_time_local, worst_weather_score, worst_summary (sentence)
+    Times are datetimes (UTC-aware / naive local), left for orjson to serialize.
     """
     hours_ahead = max(3, min(int(hours_ahead), 120))  # forecast supports up to ~5 days
 
-    data = fetch_forecast_by_coords(lat, lon)
+    data = await fetch_forecast_by_coords(lat, lon)
     if "error_from_openweather" in data:
         return data
 
     tz_offset = int(data.get("city", {}).get("timezone", 0))
-    now_utc = datetime.now(timezone.utc)
-    end_utc = now_utc + timedelta(hours=hours_ahead)
-
-    best: Optional[Dict[str, Any]] = None
-    worst: Optional[Dict[str, Any]] = None
-
-    items: List[Dict[str, Any]] = data.get("list", [])
-
-    for item in items:
-        dt_utc = datetime.fromtimestamp(int(item["dt"]), tz=timezone.utc)
-
-        if dt_utc < now_utc or dt_utc > end_utc:
-            continue
+    now_ts = int(time.time())
+    end_ts = now_ts + hours_ahead * 3600
 
-        main = item.get("main", {})
-        weather = (item.get("weather") or [{}])[0]
-        wind = item.get("wind", {})
+    # Slots are 3 hours apart and in time order, so anything past this slice is
+    # beyond the window; the +2 covers a partially elapsed first slot
+    items: List[Dict[str, Any]] = data.get("list", [])[: hours_ahead // 3 + 2]
+    if not items:
+        return {"error": "No forecast slots found in the given time window."}
 
-        temp = float(main.get("temp", 0.0))
-        feels = float(main.get("feels_like", temp))
-        humidity = int(main.get("humidity", 0))
-        desc = str(weather.get("description", "")).strip() or "weather"
-        wind_ms = float(wind.get("speed", 0.0))
-        pop = float(item.get("pop", 0.0))  # 0..1 (may be missing)
-
-        score = weather_score(temp=temp, feels_like=feels, wind=wind_ms, humidity=humidity, pop=pop)
-
-        slot = {
-            "dt_utc": dt_utc,
-            "temp": temp,
-            "feels": feels,
-            "humidity": humidity,
-            "wind": wind_ms,
-            "desc": desc,
-            "pop": _clamp(pop, 0.0, 1.0),
-            "score": score,
-        }
-
-        if best is None or slot["score"] > best["score"]:
-            best = slot
-        if worst is None or slot["score"] < worst["score"]:
-            worst = slot
-
-    if best is None:
+    # Window first, on timestamps alone, so the other fields are only
+    # pulled out of the dicts for slots that can actually win
+    dts = np.fromiter((int(item["dt"]) for item in items), dtype=np.int64, count=len(items))
+    mask = (dts >= now_ts) & (dts <= end_ts)
+    if not mask.any():
         return {"error": "No forecast slots found in the given time window."}
+    items = [item for item, keep in zip(items, mask) if keep]
+    dts = dts[mask]
+
+    n = len(items)
+    mains = [item.get("main", {}) for item in items]
+    temps = np.fromiter((float(m.get("temp", 0.0)) for m in mains), dtype=np.float64, count=n)
+    feels = np.fromiter(
+        (float(m.get("feels_like", t)) for m, t in zip(mains, temps)), dtype=np.float64, count=n
+    )
+    humidity = np.fromiter((int(m.get("humidity", 0)) for m in mains), dtype=np.int64, count=n)
+    wind = np.fromiter(
+        (float(item.get("wind", {}).get("speed", 0.0)) for item in items), dtype=np.float64, count=n
+    )
+    pop = np.fromiter((float(item.get("pop", 0.0)) for item in items), dtype=np.float64, count=n)
+    np.clip(pop, 0.0, 1.0, out=pop)
+
+    scores = weather_scores(feels, wind, humidity, pop)
+
+    # argmax/argmin return the first extreme, matching the old strict > / < scan
+    best_idx = int(np.argmax(scores))
+    worst_idx = int(np.argmin(scores))
+
+    # Only the two winning slots are turned into datetimes and sentences
+    def summary(i: int) -> str:
+        weather = (items[i].get("weather") or [{}])[0]
+        desc = str(weather.get("description", "")).strip() or "weather"
+        return make_sentence(float(feels[i]), desc, float(pop[i]), int(scores[i]))
+
+    # Raw datetimes, trimmed to the minute; orjson renders them when the route responds
+    def to_utc(i: int) -> datetime:
+        return datetime.fromtimestamp(int(dts[i]), tz=timezone.utc).replace(second=0)
 
-    def to_local_iso(dt: datetime) -> str:
+    def to_local(dt: datetime) -> datetime:
         # convert by timezone offset seconds
-        return (dt + timedelta(seconds=tz_offset)).replace(tzinfo=None).isoformat(timespec="minutes")
+        return (dt + timedelta(seconds=tz_offset)).replace(tzinfo=None)
 
-    best_sentence = make_sentence(best["feels"], best["desc"], best["pop"], best["score"])
-    worst_sentence = make_sentence(worst["feels"], worst["desc"], worst["pop"], worst["score"]) if worst else best_sentence
+    best_dt = to_utc(best_idx)
+    worst_dt = to_utc(worst_idx)
 
     return {
         "location": label or f"{lat},{lon}",
 
-        "best_time_utc": best["dt_utc"].isoformat(timespec="minutes"),
-        "best_time_local": to_local_iso(best["dt_utc"]),
-        "best_weather_score": int(best["score"]),
-        "best_summary": best_sentence,
+        "best_time_utc": best_dt,
+        "best_time_local": to_local(best_dt),
+        "best_weather_score": int(scores[best_idx]),
+        "best_summary": summary(best_idx),
 
-        "worst_time_utc": worst["dt_utc"].isoformat(timespec="minutes") if worst else None,
-        "worst_time_local": to_local_iso(worst["dt_utc"]) if worst else None,
-        "worst_weather_score": int(worst["score"]) if worst else int(best["score"]),
-        "worst_summary": worst_sentence,
+        "worst_time_utc": worst_dt,
+        "worst_time_local": to_local(worst_dt),
+        "worst_weather_score": int(scores[worst_idx]),
+        "worst_summary": summary(worst_idx),
     }
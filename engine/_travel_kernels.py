@@ -0,0 +1,211 @@
+"""
+SmartTrip AI - Travel Matrix Kernels
+Compute kernels behind estimate_travel_matrix. Compiled with Numba when it is
+installed; otherwise the same model runs as a NumPy broadcast. The smallest
+matrices use straight-line kernels generated per size at import.
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover - depends on the environment
+    HAVE_NUMBA = False
+
+
+def _road_km(lats, lons, detour):
+    # cos(lat) is computed once per location, and the (n, n) haversine runs
+    # as in-place ufunc passes over three buffers. Deltas are taken in degrees
+    # before converting, in haversine_km's order of operations.
+    cos_lat = np.cos(np.radians(lats))
+    s_dlat = np.subtract(lats[None, :], lats[:, None])
+    np.radians(s_dlat, out=s_dlat)
+    s_dlat /= 2
+    np.sin(s_dlat, out=s_dlat)
+    s_dlat *= s_dlat
+    s_dlon = np.subtract(lons[None, :], lons[:, None])
+    np.radians(s_dlon, out=s_dlon)
+    s_dlon /= 2
+    np.sin(s_dlon, out=s_dlon)
+    s_dlon *= s_dlon
+    a = np.multiply(cos_lat[:, None], cos_lat[None, :])
+    a *= s_dlon
+    a += s_dlat
+    # road_km = 2R * atan2(sqrt(a), sqrt(1 - a)), reusing the sine buffers
+    np.sqrt(a, out=s_dlat)
+    np.subtract(1, a, out=a)
+    np.sqrt(a, out=a)
+    road_km = np.arctan2(s_dlat, a, out=s_dlon)
+    road_km *= 6371.0 * 2
+    road_km *= detour
+    np.maximum(road_km, 0.3, out=road_km)
+    return road_km
+
+
+def _road_km_cosines(lats, lons, detour):
+    # Spherical law of cosines: with sin(lat) and cos(lat) per location, each
+    # cell needs one cos and one arccos instead of _road_km's five ufuncs.
+    # Within a city it agrees with haversine to well under a millimetre.
+    rad_lat, rad_lon = np.radians(lats), np.radians(lons)
+    sin_lat, cos_lat = np.sin(rad_lat), np.cos(rad_lat)
+    road_km = np.subtract(rad_lon[None, :], rad_lon[:, None])
+    np.cos(road_km, out=road_km)
+    road_km *= np.multiply(cos_lat[:, None], cos_lat[None, :])
+    road_km += np.multiply(sin_lat[:, None], sin_lat[None, :])
+    np.clip(road_km, -1.0, 1.0, out=road_km)
+    np.arccos(road_km, out=road_km)
+    road_km *= 6371.0
+    road_km *= detour
+    np.maximum(road_km, 0.3, out=road_km)
+    return road_km
+
+
+def _pair_traffic(traffic, seasonal):
+    # (..., n) per-location traffic -> (..., n, n) capped pair averages
+    traffic_index = traffic[..., :, None] + traffic[..., None, :]
+    traffic_index /= 2
+    traffic_index *= seasonal
+    np.clip(traffic_index, 0.0, 1.0, out=traffic_index)
+    return traffic_index
+
+
+def _minutes(road_km, traffic_index, free_flow, congested):
+    # Speed interpolation and floor as one branch-free chain of in-place
+    # passes; road_km broadcasts over any leading (hour) axis
+    speed = traffic_index * (free_flow - congested)
+    np.subtract(free_flow, speed, out=speed)
+    np.maximum(speed, congested * 0.7, out=speed)
+    np.divide(road_km, speed, out=speed)
+    speed *= 60
+    return speed
+
+
+def _travel_matrix_numpy(lats, lons, traffic, seasonal, free_flow, congested, detour):
+    # The matrix is symmetric, but gathering just the upper triangle costs
+    # NumPy more than the halved math saves until n is in the hundreds
+    return _minutes(_road_km_cosines(lats, lons, detour), _pair_traffic(traffic, seasonal),
+                    free_flow, congested)
+
+
+if HAVE_NUMBA:
+    # No fastmath: reordered float math would drift from the NumPy kernel.
+    # Rows run in parallel over shared read-only inputs, and nogil lets
+    # callers overlap whole matrices from a thread pool.
+    @njit(parallel=True, nogil=True, cache=True)
+    def _travel_matrix_numba(lats, lons, traffic, seasonal, free_flow, congested, detour):
+        # Every term is symmetric in (i, j), so only the upper triangle is
+        # computed and mirrored; the diagonal stays zero
+        n = lats.shape[0]
+        out = np.zeros((n, n))
+        rad_lat = np.radians(lats)
+        rad_lon = np.radians(lons)
+        sin_lat = np.sin(rad_lat)
+        cos_lat = np.cos(rad_lat)
+        floor = congested * 0.7
+        for i in prange(n):
+            for j in range(i + 1, n):
+                cos_d = math.cos(rad_lon[j] - rad_lon[i]) * (cos_lat[i] * cos_lat[j]) + \
+                    sin_lat[i] * sin_lat[j]
+                road_km = max(6371.0 * math.acos(min(max(cos_d, -1.0), 1.0)) * detour, 0.3)
+                traffic_index = min((traffic[i] + traffic[j]) / 2 * seasonal, 1.0)
+                speed = max(free_flow - (free_flow - congested) * traffic_index, floor)
+                minutes = road_km / speed * 60
+                out[i, j] = minutes
+                out[j, i] = minutes
+        return out
+
+
+def travel_matrix_kernel(lats, lons, traffic, seasonal, free_flow, congested, detour) -> np.ndarray:
+    """
+    (n, n) unrounded travel minutes from location i (rows) to j; the
+    diagonal is not meaningful (callers zero it).
+
+    Distances use the spherical law of cosines, which at city scale matches
+    estimate_travel_time's haversine to far below the 0.1-minute rounding.
+    Both backends release the GIL for the heavy work (Numba's kernel
+    entirely, NumPy's inside each ufunc), so independent matrices can be
+    built concurrently with a ThreadPoolExecutor.
+    `traffic` holds each location's zone traffic index; pairs average origin
+    and destination before the seasonal multiplier, as in estimate_travel_time.
+    """
+    args = (np.ascontiguousarray(lats, dtype=np.float64),
+            np.ascontiguousarray(lons, dtype=np.float64),
+            np.ascontiguousarray(traffic, dtype=np.float64),
+            float(seasonal), float(free_flow), float(congested), float(detour))
+    if HAVE_NUMBA:
+        return _travel_matrix_numba(*args)
+    return _travel_matrix_numpy(*args)
+
+
+def travel_stack_kernel(lats, lons, traffic_by_hour, seasonal, free_flow, congested, detour):
+    """
+    Unrounded (minutes, traffic_index) arrays of shape (24, n, n): one
+    travel_matrix_kernel block per departure hour, from (24, n) per-location
+    traffic. Road distances are computed once and shared by every hour, with
+    haversine_km's formula and order of operations: the optimizer's search
+    reads this stack, and once rounded (0.1 minute, 0.001 traffic) it agrees
+    with estimate_travel_time. Unrounded values may still differ from it in
+    the last bits, as NumPy's sin need not match math.sin.
+    """
+    lats = np.ascontiguousarray(lats, dtype=np.float64)
+    lons = np.ascontiguousarray(lons, dtype=np.float64)
+    traffic_index = _pair_traffic(
+        np.ascontiguousarray(traffic_by_hour, dtype=np.float64), float(seasonal))
+    minutes = _minutes(_road_km(lats, lons, float(detour)), traffic_index,
+                       float(free_flow), float(congested))
+    return minutes, traffic_index
+
+
+# ── Small-n Specialized Kernels ─────────────────────────
+# Most requests carry a handful of stops, where NumPy's per-call overhead
+# dominates. For those sizes a kernel is generated with every pair unrolled
+# into the same math-module calls as estimate_travel_time, in the same order,
+# so the rounded minutes match it exactly. Each unordered pair is computed
+# once: both the haversine and the traffic average are symmetric.
+
+SMALL_MATRIX_SIZES = range(2, 7)
+
+
+def _specialize_matrix(n: int):
+    idx = range(n)
+    src = [
+        "def kernel(lat, lon, traffic, seasonal, free_flow, congested, detour):",
+        f"    {', '.join(f'lat{i}' for i in idx)}, = lat",
+        f"    {', '.join(f'lon{i}' for i in idx)}, = lon",
+        f"    {', '.join(f't{i}' for i in idx)}, = traffic",
+        "    delta = free_flow - congested",
+        "    floor = congested * 0.7",
+    ]
+    src += [f"    c{i} = cos(radians(lat{i}))" for i in idx]
+    for i in idx:
+        for j in range(i + 1, n):
+            src += [
+                f"    a = sin(radians(lat{j} - lat{i}) / 2)**2 + "
+                f"c{i} * c{j} * sin(radians(lon{j} - lon{i}) / 2)**2",
+                "    km = max(6371.0 * 2 * atan2(sqrt(a), sqrt(1 - a)) * detour, 0.3)",
+                f"    ti = min((t{i} + t{j}) / 2 * seasonal, 1.0)",
+                f"    m{i}_{j} = round(km / max(free_flow - delta * ti, floor) * 60, 1)",
+            ]
+    rows = (
+        "[" + ", ".join("0.0" if i == j else f"m{min(i, j)}_{max(i, j)}" for j in idx) + "]"
+        for i in idx
+    )
+    src.append(f"    return [{', '.join(rows)}]")
+    namespace = {name: getattr(math, name) for name in ("atan2", "cos", "radians", "sin", "sqrt")}
+    exec("\n".join(src), namespace)
+    return namespace["kernel"]
+
+
+_MATRIX_KERNELS = {n: _specialize_matrix(n) for n in SMALL_MATRIX_SIZES}
+
+
+def small_matrix_kernel(n: int):
+    """
+    Unrolled kernel for an n-location matrix, or None outside
+    SMALL_MATRIX_SIZES. Takes sequences of floats and the
+    travel_matrix_kernel scalars, and returns the rounded matrix as nested
+    lists with a zero diagonal.
+    """
+    return _MATRIX_KERNELS.get(n)
@@ -0,0 +1,36 @@
+"""
+SmartTrip AI - Dataset Cache Builder
+Parses the Phase 1 CSVs under DATA_DIR and writes the DataStore caches to
+DATA_DIR/cache: the pickled lookup tables and the memory-mapped per-city
+weather arrays. Run it at deploy time so servers and workers start from the
+cache instead of parsing CSVs on their first request.
+
+    SMARTTRIP_DATA_DIR=/path/to/phase1_data python -m engine.build_cache
+"""
+
+import os
+from pathlib import Path
+
+from engine.data_loader import DATA_DIR, DataStore
+
+
+def build_cache() -> Path:
+    """Rebuild the caches from the CSVs and return the cache directory."""
+    cache_dir = Path(DATA_DIR) / "cache"
+    cache_path = cache_dir / "datastore.pkl"
+    # Saving is best effort, so clear the old file to tell success from failure
+    cache_path.unlink(missing_ok=True)
+    DataStore(rebuild=True)
+    if not cache_path.exists():
+        raise OSError(f"Could not write the DataStore cache under {cache_dir}")
+    return cache_dir
+
+
+def main():
+    cache_dir = build_cache()
+    for path in sorted(cache_dir.iterdir()):
+        print(f"  {path.name:<24s} {os.path.getsize(path):>10,d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,61 @@ SmartTrip AI - Data Loader
 Loads all Phase 1 datasets and provides fast lookup interfaces.
 """
 
-import pandas as pd
+import numpy as np
+import glob
 import json
 import math
+import os
+import pickle
+from functools import cached_property
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
-DATA_DIR = r"C:\Users\smvk2\OneDrive\Desktop\Trip_optimizer\engine\phase1_data.xlsx"
+# Dataset root holding attractions/, traffic/, weather/ and events/
+DATA_DIR = Path(os.environ.get(
+    "SMARTTRIP_DATA_DIR", Path(__file__).parent / "phase1_data")).resolve()
+
+_DEFAULT_WEATHER_ROW = np.array([20.0, 0.0])
+_DEFAULT_TRAFFIC = 0.3
+
+# day_type string -> axis index in the dense traffic table
+DAY_TYPE_BIT = {"weekday": 0, "weekend": 1}
+
+# Zone count above which lookups first narrow to a latitude band
+_ZONE_BAND_MIN = 16
+
+# Zone grid: cells per side, and the code for cells outside every zone
+# (other codes: 0 = test exactly, k + 1 = zone k in load order)
+_ZONE_GRID_SIZE = 256
+_ZONE_GRID_OUTSIDE = 255
+
+# Dataset files under DATA_DIR; the parsed DataStore is cached while all
+# of them are older than the cache
+_DATASET_FILES = (
+    "attractions/attractions_database.csv",
+    "traffic/traffic_baseline.csv",
+    "traffic/zone_definitions.csv",
+    "traffic/seasonal_adjustments.csv",
+    "weather/weather_baseline.csv",
+    "events/major_venues.csv",
+)
+# Bump when the DataStore's parsed state changes shape, so old caches are rebuilt
+_STORE_CACHE_VERSION = 3
+# State left out of the cache: raw tables are re-read on demand and weather
+# arrays have their own memory-mapped .npy cache
+_UNCACHED_STATE = frozenset({
+    "attractions_df", "traffic_df", "zones_df", "venues_df", "seasonal_df",
+    "_weather_days", "_weather_by_id",
+})
+
+
+def peak_hours_mask(hours) -> int:
+    """Pack a list of hours (0-23) into a bitmask: bit h set <=> h in hours."""
+    mask = 0
+    for h in hours:
+        if 0 <= h < 24:
+            mask |= 1 << int(h)
+    return mask
 
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -21,22 +70,201 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+def haversine_km_vec(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Vectorized haversine_km over NumPy arrays (broadcasting)."""
+    R = 6371.0
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float))
+                              for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * \
+        np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _load_weather_days(csv_path: Path, cache_dir: Path, rebuild: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Load per-city (13, 24, 2) weather arrays, preferring memory-mapped
+    `weather_v<version>_<city>.npy` files in cache_dir. The cache is rebuilt
+    from the CSV when asked to, when the CSV is newer or when a file can't be
+    read; files are replaced atomically, so workers that already map the old
+    ones keep reading them. If the cache can't be written, in-memory arrays
+    are used.
+    """
+    prefix = os.path.join(cache_dir, f"weather_v{_STORE_CACHE_VERSION}_")
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    cached = sorted(glob.glob(f"{prefix}*.npy"))
+    if not rebuild and cached and (
+            csv_mtime is None or min(map(os.path.getmtime, cached)) >= csv_mtime):
+        try:
+            return {path[len(prefix):-len(".npy")]: np.load(path, mmap_mode="r")
+                    for path in cached}
+        except (OSError, EOFError, ValueError):
+            pass
+
+    import pandas as pd
+    weather_df = pd.read_csv(csv_path)
+    days: Dict[str, np.ndarray] = {}
+    for row in weather_df.itertuples(index=False):
+        city = row.city.lower()
+        if city not in days:
+            days[city] = np.tile(_DEFAULT_WEATHER_ROW, (13, 24, 1))
+        days[city][int(row.month), int(row.hour)] = (
+            float(row.avg_temperature_c), float(row.heat_discomfort_index))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for city, arr in days.items():
+            path = f"{prefix}{city}.npy"
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp_path, path)
+            days[city] = np.load(path, mmap_mode="r")
+    except OSError:
+        pass
+    return days
+
+
+def _build_zone_grid(lat_rad, lon_rad, cos_lat, radius_km) -> Tuple[float, float, float, float, np.ndarray]:
+    """
+    Rasterize a city's zone circles onto a _ZONE_GRID_SIZE² grid over their
+    bounding box: (lat_lo, lon_lo, dlat, dlon, codes), angles in radians.
+
+    A cell wholly inside some zone gets that zone's code when, for every
+    point in it, the zone is also the nearest covering one; a cell wholly
+    outside every zone gets _ZONE_GRID_OUTSIDE; anything else gets 0.
+    Decisions use the triangle inequality with a bound on the cell's extent,
+    so they always agree with the exact distance test.
+    """
+    n = _ZONE_GRID_SIZE
+    ang = radius_km / 6371.0
+    # A circle spans at most ang / cos(most poleward latitude) in longitude;
+    # pad the box a little more so points outside it are surely outside
+    lon_ang = ang / np.cos(np.minimum(np.abs(lat_rad) + ang, 1.5)) * 1.01
+    lat_lo, lat_hi = float((lat_rad - ang * 1.01).min()), float((lat_rad + ang * 1.01).max())
+    lon_lo, lon_hi = float((lon_rad - lon_ang).min()), float((lon_rad + lon_ang).max())
+    dlat, dlon = (lat_hi - lat_lo) / n, (lon_hi - lon_lo) / n
+
+    # Haversine from each cell center to each zone center: (n, n, zones)
+    c_lat = (lat_lo + (np.arange(n) + 0.5) * dlat)[:, None, None]
+    c_lon = (lon_lo + (np.arange(n) + 0.5) * dlon)[None, :, None]
+    a = np.sin((lat_rad - c_lat) / 2)**2 + np.cos(c_lat) * \
+        cos_lat * np.sin((lon_rad - c_lon) / 2)**2
+    dist = 6371.0 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    # No point of a cell is further from its center than R·(dlat/2 + dlon/2)
+    reach = 6371.0 * (dlat + dlon) / 2 + 1e-6
+    inside = dist + reach < radius_km
+    outside = dist - reach >= radius_km
+
+    # Nearest fully-covering zone per cell; decided when every other zone
+    # either misses the cell or is further away from all of its points
+    nearest = np.where(inside, dist, np.inf).argmin(axis=2)
+    near_dist = np.take_along_axis(dist, nearest[..., None], axis=2)
+    others_clear = outside | (dist - reach > near_dist + reach)
+    others_clear[np.arange(n)[:, None], np.arange(n)[None, :], nearest] = True
+    decided = inside.any(axis=2) & others_clear.all(axis=2)
+
+    codes = np.zeros((n, n), dtype=np.uint8)
+    codes[outside.all(axis=2)] = _ZONE_GRID_OUTSIDE
+    codes[decided] = nearest[decided] + 1
+    return lat_lo, lon_lo, dlat, dlon, codes
+
+
+def _freeze_arrays(value):
+    """Mark every NumPy array inside `value` (nested dicts, lists, tuples) read-only."""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze_arrays(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze_arrays(item)
+
+
+def _raw_table(relpath: str) -> cached_property:
+    """A DataStore attribute holding one dataset CSV as a DataFrame, read on first use."""
+    def read(self):
+        # pandas is only needed to parse the CSVs, not to serve lookups
+        import pandas as pd
+        return pd.read_csv(Path(DATA_DIR) / relpath)
+    return cached_property(read)
+
+
 class DataStore:
     """Central data store for all SmartTrip datasets."""
 
-    def __init__(self):
-        self._load_all()
+    attractions_df = _raw_table("attractions/attractions_database.csv")
+    traffic_df = _raw_table("traffic/traffic_baseline.csv")
+    zones_df = _raw_table("traffic/zone_definitions.csv")
+    venues_df = _raw_table("events/major_venues.csv")
+    seasonal_df = _raw_table("traffic/seasonal_adjustments.csv")
+
+    def __init__(self, rebuild: bool = False):
+        self._load_all(rebuild)
+
+    def _load_all(self, rebuild: bool = False):
+        data_dir = Path(DATA_DIR)
+        if not data_dir.is_dir():
+            raise FileNotFoundError(
+                f"Dataset directory not found: {data_dir} (set SMARTTRIP_DATA_DIR)")
+        cache_path = data_dir / "cache" / "datastore.pkl"
+        if rebuild or not self._load_cached(cache_path):
+            self._parse_datasets(rebuild)
+            self._save_cached(cache_path)
+        # Lookup tables are shared across threads and never change after
+        # load; only the memory-mapped weather arrays also share pages
+        # across worker processes
+        _freeze_arrays(self.__dict__)
+
+    def _load_cached(self, cache_path: Path) -> bool:
+        """
+        Restore the parsed state from cache_path if it is newer than every
+        dataset file. Returns False (leaving the store untouched) otherwise.
+        """
+        try:
+            cache_mtime = os.path.getmtime(cache_path)
+        except OSError:
+            return False
+        data_dir = Path(DATA_DIR)
+        for relpath in _DATASET_FILES:
+            path = data_dir / relpath
+            if path.exists() and path.stat().st_mtime > cache_mtime:
+                return False
+        try:
+            with open(cache_path, "rb") as f:
+                version, state = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return False
+        if version != _STORE_CACHE_VERSION:
+            return False
+
+        self.__dict__.update(state)
+        self._weather_days = _load_weather_days(
+            data_dir / "weather" / "weather_baseline.csv", data_dir / "cache")
+        cities = sorted(self._city_id, key=self._city_id.get)
+        self._weather_by_id = [self._weather_days.get(city) for city in cities]
+        return True
+
+    def _save_cached(self, cache_path: Path):
+        """Pickle the parsed state for the next process; best effort."""
+        state = {k: v for k, v in self.__dict__.items() if k not in _UNCACHED_STATE}
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump((_STORE_CACHE_VERSION, state), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
 
-    def _load_all(self):
+    def _parse_datasets(self, rebuild: bool = False):
         # Attractions
-        self.attractions_df = pd.read_csv(
-            f"{DATA_DIR}/attractions/attractions_database.csv")
         self.attractions_by_id = {}
-        for _, row in self.attractions_df.iterrows():
-            rec = row.to_dict()
+        for rec in self.attractions_df.to_dict("records"):
             # Parse peak_hours JSON
             ph = rec.get("peak_hours_json", "[]")
             rec["peak_hours"] = json.loads(ph) if isinstance(ph, str) else []
+            rec["peak_hours_mask"] = peak_hours_mask(rec["peak_hours"])
             # Normalize booleans
             for bf in ("heat_sensitive", "sunset_sensitive"):
                 val = rec.get(bf, False)
@@ -44,61 +272,153 @@ class DataStore:
                     val).strip().lower() in ("true", "1", "yes")
             self.attractions_by_id[rec["id"]] = rec
 
+        # Priority-sorted indexes per (city, category); category "" = all
+        self._attractions_sorted: Dict[Tuple[str, str], List[dict]] = {}
+        for rec in sorted(self.attractions_by_id.values(),
+                          key=lambda a: a.get("priority_score", 0), reverse=True):
+            city = rec["city"].lower()
+            category = str(rec.get("category", "")).lower()
+            self._attractions_sorted.setdefault((city, ""), []).append(rec)
+            if category:
+                self._attractions_sorted.setdefault(
+                    (city, category), []).append(rec)
+        # Negated priorities (ascending) for np.searchsorted cutoffs
+        self._neg_priority: Dict[Tuple[str, str], np.ndarray] = {
+            key: -np.array([a.get("priority_score", 0) for a in lst], dtype=float)
+            for key, lst in self._attractions_sorted.items()
+        }
+        # Attraction coordinate columns (SoA) and each id's row within them,
+        # so distance work can gather coordinates without walking dicts
+        self._attraction_row: Dict[str, int] = {
+            aid: row for row, aid in enumerate(self.attractions_by_id)}
+        self._lat = np.array(
+            [a["latitude"] for a in self.attractions_by_id.values()], dtype=np.float64)
+        self._lon = np.array(
+            [a["longitude"] for a in self.attractions_by_id.values()], dtype=np.float64)
+
         # Traffic baseline
-        self.traffic_df = pd.read_csv(
-            f"{DATA_DIR}/traffic/traffic_baseline.csv")
         # Build lookup: (city_lower, zone, day_type, hour) -> index
-        self._traffic_lookup: Dict[Tuple, float] = {}
-        for _, row in self.traffic_df.iterrows():
-            key = (row["city"].lower(), row["zone"],
-                   row["day_type"], int(row["hour"]))
-            self._traffic_lookup[key] = float(row["avg_traffic_index"])
-
-        # Weather baseline
-        self.weather_df = pd.read_csv(
-            f"{DATA_DIR}/weather/weather_baseline.csv")
-        self._weather_lookup: Dict[Tuple, dict] = {}
-        for _, row in self.weather_df.iterrows():
-            key = (row["city"].lower(), int(row["month"]), int(row["hour"]))
-            self._weather_lookup[key] = {
-                "temperature": float(row["avg_temperature_c"]),
-                "heat_discomfort": float(row["heat_discomfort_index"]),
-            }
+        tdf = self.traffic_df
+        self._traffic_lookup: Dict[Tuple, float] = dict(zip(
+            zip(tdf["city"].str.lower().tolist(), tdf["zone"].tolist(),
+                tdf["day_type"].tolist(), tdf["hour"].astype(int).tolist()),
+            tdf["avg_traffic_index"].astype(float).tolist(),
+        ))
+
+        # Weather baseline: dense per-city [month (1-12), hour, (temperature,
+        # heat_discomfort)] arrays, memory-mapped read-only from .npy files so
+        # every worker process shares one physical copy
+        data_dir = Path(DATA_DIR)
+        self._weather_days: Dict[str, np.ndarray] = _load_weather_days(
+            data_dir / "weather" / "weather_baseline.csv", data_dir / "cache", rebuild)
 
         # Zone definitions
-        self.zones_df = pd.read_csv(f"{DATA_DIR}/traffic/zone_definitions.csv")
         self._zones: Dict[str, List[dict]] = {}
-        for _, row in self.zones_df.iterrows():
-            city = row["city"].lower()
-            if city not in self._zones:
-                self._zones[city] = []
-            self._zones[city].append({
-                "zone": row["zone"],
-                "lat": float(row["center_latitude"]),
-                "lon": float(row["center_longitude"]),
-                "radius_km": float(row["radius_km"]),
-            })
+        zdf = self.zones_df
+        for city, zone, lat, lon, radius in zip(
+                zdf["city"].str.lower().tolist(), zdf["zone"].tolist(),
+                zdf["center_latitude"].astype(float).tolist(),
+                zdf["center_longitude"].astype(float).tolist(),
+                zdf["radius_km"].astype(float).tolist()):
+            self._zones.setdefault(city, []).append(
+                {"zone": zone, "lat": lat, "lon": lon, "radius_km": radius})
+        # Same zones as contiguous arrays for one-shot vectorized lookups:
+        # city -> (lat_rad, lon_rad, cos_lat, radius_km, names)
+        self._zones_np: Dict[str, Tuple[np.ndarray, ...]] = {}
+        for city, zones in self._zones.items():
+            lat_rad = np.radians([z["lat"] for z in zones])
+            self._zones_np[city] = (
+                lat_rad,
+                np.radians([z["lon"] for z in zones]),
+                np.cos(lat_rad),
+                np.array([z["radius_km"] for z in zones]),
+                tuple(z["zone"] for z in zones),
+            )
+        # ...and as per-zone float tuples for the scalar lookup
+        self._zones_rad: Dict[str, List[Tuple[float, float, float, float, str]]] = {
+            city: list(zip(*(arr.tolist() for arr in zs[:4]), zs[4]))
+            for city, zs in self._zones_np.items()
+        }
+        # Latitude band index. A point further from a zone center in latitude
+        # alone than the zone's radius is outside it, so a lookup only tests
+        # zones within the city's largest radius north/south of the point:
+        # city -> (lat_rad sorted, zone indexes in that order, max radius in rad)
+        self._zone_lat_sorted: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for city, (lat_rad, _, _, radius_km, _) in self._zones_np.items():
+            order = np.argsort(lat_rad, kind="stable")
+            max_radius = float(radius_km.max()) / 6371.0 if len(order) else 0.0
+            # Small slack so rounding never drops a zone right at the edge
+            self._zone_lat_sorted[city] = (lat_rad[order], order, max_radius + 1e-9)
+        # Uniform grid so most lookups are one array read; see _build_zone_grid
+        self._zone_grid: Dict[str, Tuple[float, float, float, float, np.ndarray]] = {
+            city: _build_zone_grid(*zs[:4])
+            for city, zs in self._zones_np.items()
+            if 0 < len(zs[4]) < _ZONE_GRID_OUTSIDE
+        }
 
         # Event venues
-        self.venues_df = pd.read_csv(f"{DATA_DIR}/events/major_venues.csv")
         self.venues = []
-        for _, row in self.venues_df.iterrows():
-            v = row.to_dict()
+        for v in self.venues_df.to_dict("records"):
             v["event_types"] = json.loads(v["event_types"]) if isinstance(
                 v["event_types"], str) else []
             v["typical_event_days"] = json.loads(v["typical_event_days"]) if isinstance(
                 v["typical_event_days"], str) else []
             self.venues.append(v)
+        # Venues grouped by (city_lower, affected_zone), event days as sets
+        self._venues_by_city_zone: Dict[Tuple[str, str], List[dict]] = {}
+        for v in self.venues:
+            v["event_days_set"] = frozenset(v["typical_event_days"])
+            self._venues_by_city_zone.setdefault(
+                (v["city"].lower(), v["affected_zone"]), []).append(v)
 
         # Seasonal adjustments
         try:
-            self.seasonal_df = pd.read_csv(
-                f"{DATA_DIR}/traffic/seasonal_adjustments.csv")
-            self._seasonal = {int(r["month"]): float(
-                r["seasonal_multiplier"]) for _, r in self.seasonal_df.iterrows()}
+            self._seasonal = dict(zip(
+                self.seasonal_df["month"].astype(int).tolist(),
+                self.seasonal_df["seasonal_multiplier"].astype(float).tolist()))
         except FileNotFoundError:
             self._seasonal = {m: 1.0 for m in range(1, 13)}
 
+        self._build_dense_tables()
+
+    def _build_dense_tables(self):
+        """
+        Encode cities and zones as small ints and lay traffic and weather out
+        as dense arrays, so hot-path lookups are integer indexing instead of
+        lowercasing strings and hashing tuple keys.
+        """
+        cities = sorted({c for c, *_ in self._traffic_lookup}
+                        | set(self._zones) | set(self._weather_days))
+        self._city_id: Dict[str, int] = {c: i for i, c in enumerate(cities)}
+
+        # Zone 0 is always "Central": unknown zones fall back to it
+        self._zone_id: List[Dict[str, int]] = []
+        for city in cities:
+            names = {z for c, z, *_ in self._traffic_lookup if c == city}
+            names.update(z["zone"] for z in self._zones.get(city, []))
+            names.discard("Central")
+            self._zone_id.append(
+                {z: i for i, z in enumerate(["Central"] + sorted(names))})
+
+        # traffic[city_id, zone_id, day_type_bit, hour]; missing cells take the
+        # city's Central value for that slot, then the global default
+        n_zones = max(len(ids) for ids in self._zone_id) if cities else 1
+        self._traffic_arr = np.full(
+            (len(cities), n_zones, len(DAY_TYPE_BIT), 24), _DEFAULT_TRAFFIC)
+        for (city, zone, day_type, hour), val in self._traffic_lookup.items():
+            if zone == "Central" and day_type in DAY_TYPE_BIT:
+                self._traffic_arr[self._city_id[city], :,
+                                  DAY_TYPE_BIT[day_type], hour] = val
+        for (city, zone, day_type, hour), val in self._traffic_lookup.items():
+            if zone != "Central" and day_type in DAY_TYPE_BIT:
+                cid = self._city_id[city]
+                self._traffic_arr[cid, self._zone_id[cid][zone],
+                                  DAY_TYPE_BIT[day_type], hour] = val
+
+        # weather[city_id] -> (13, 24, 2), None where a city has no weather data
+        self._weather_by_id: List[Optional[np.ndarray]] = [
+            self._weather_days.get(city) for city in cities]
+
     # ── Lookup Methods ──────────────────────────────────────
 
     def get_attraction(self, attraction_id: str) -> Optional[dict]:
@@ -108,45 +428,223 @@ class DataStore:
         city_lower = city.lower()
         return [a for a in self.attractions_by_id.values() if a["city"].lower() == city_lower]
 
+    def get_top_attractions(
+        self, city: str, category: str = "",
+        min_priority: Optional[float] = None, limit: Optional[int] = None,
+    ) -> List[dict]:
+        """Attractions for a city (optionally one category), by priority descending."""
+        key = (city.lower(), category.lower())
+        ranked = self._attractions_sorted.get(key, [])
+        end = len(ranked)
+        if min_priority is not None:
+            end = int(np.searchsorted(
+                self._neg_priority[key], -min_priority, side="right")) if ranked else 0
+        if limit is not None:
+            end = min(end, max(limit, 0))
+        return ranked[:end]
+
+    def coords_of(self, ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(latitudes, longitudes) of the given attractions, as float64 arrays in `ids` order."""
+        rows = self._attraction_row
+        index = np.fromiter((rows[aid] for aid in ids), dtype=np.intp, count=len(ids))
+        return self._lat[index], self._lon[index]
+
+    def city_id(self, city: str) -> int:
+        """Integer id of a city for the *_ids lookups, or -1 if unknown."""
+        return self._city_id.get(city.lower(), -1)
+
+    def zone_id(self, city_id: int, zone: str) -> int:
+        """Integer id of a zone within a city; unknown zones map to Central (0)."""
+        return self._zone_id[city_id].get(zone, 0) if city_id >= 0 else 0
+
+    def get_traffic_index_ids(self, city_id: int, zone_id: int, day_type_bit: int, hour: int) -> float:
+        """get_traffic_index on pre-resolved ids (see city_id / zone_id / DAY_TYPE_BIT)."""
+        if city_id < 0:
+            return _DEFAULT_TRAFFIC
+        return self._traffic_arr.item(city_id, zone_id, day_type_bit, hour % 24)
+
+    def get_weather_ids(self, city_id: int, month: int, hour: int) -> Tuple[float, float]:
+        """(temperature, heat_discomfort) on a pre-resolved city id."""
+        days = self._weather_by_id[city_id] if city_id >= 0 else None
+        if days is None or not (1 <= month <= 12):
+            return 20.0, 0.0
+        return days.item(month, hour % 24, 0), days.item(month, hour % 24, 1)
+
     def get_traffic_index(self, city: str, zone: str, day_type: str, hour: int) -> float:
         """Get traffic congestion index (0-1) for given conditions."""
-        key = (city.lower(), zone, day_type, hour % 24)
-        val = self._traffic_lookup.get(key)
-        if val is not None:
-            return val
-        # Fallback: try without exact zone match → use Central
-        fallback_key = (city.lower(), "Central", day_type, hour % 24)
-        return self._traffic_lookup.get(fallback_key, 0.3)
+        city_id = self.city_id(city)
+        day_type_bit = DAY_TYPE_BIT.get(day_type)
+        if city_id < 0 or day_type_bit is None:
+            return _DEFAULT_TRAFFIC
+        # Unknown zones fall back to the city's Central profile
+        return self._traffic_arr.item(
+            city_id, self._zone_id[city_id].get(zone, 0), day_type_bit, hour % 24)
+
+    def get_traffic_profiles(self, city: str, day_type: str) -> Dict[str, Tuple[float, ...]]:
+        """Hourly traffic (24 values) for every zone of a city, always including Central."""
+        city_id = self.city_id(city)
+        day_type_bit = DAY_TYPE_BIT.get(day_type)
+        if city_id < 0 or day_type_bit is None:
+            return {"Central": (_DEFAULT_TRAFFIC,) * 24}
+        return {
+            zone: tuple(self._traffic_arr[city_id, zid, day_type_bit].tolist())
+            for zone, zid in self._zone_id[city_id].items()
+        }
+
+    def traffic_index_tensor(self, cities: List[str], zones: List[str], day_type: str) -> np.ndarray:
+        """
+        Traffic index for every (city, zone, hour) as a (len(cities), len(zones), 24)
+        array, with the same fallbacks as get_traffic_index.
+        """
+        out = np.full((len(cities), len(zones), 24), _DEFAULT_TRAFFIC)
+        day_type_bit = DAY_TYPE_BIT.get(day_type)
+        if day_type_bit is None:
+            return out
+        for row, city in enumerate(cities):
+            city_id = self.city_id(city)
+            if city_id >= 0:
+                zone_ids = [self._zone_id[city_id].get(zone, 0) for zone in zones]
+                out[row] = self._traffic_arr[city_id, zone_ids, day_type_bit]
+        return out
 
     def get_weather(self, city: str, month: int, hour: int) -> dict:
         """Get temperature and heat discomfort for given conditions."""
-        key = (city.lower(), month, hour % 24)
-        return self._weather_lookup.get(key, {"temperature": 20.0, "heat_discomfort": 0.0})
+        temperature, heat_discomfort = self.get_weather_ids(self.city_id(city), month, hour)
+        return {"temperature": temperature, "heat_discomfort": heat_discomfort}
+
+    def get_weather_day(self, city: str, month: int) -> np.ndarray:
+        """Get the full 24-hour profile as a (24, 2) array of (temperature, heat_discomfort)."""
+        days = self._weather_days.get(city.lower())
+        if days is None:
+            return np.tile(_DEFAULT_WEATHER_ROW, (24, 1))
+        return days[month]
+
+    # ── Async variants ──────────────────────────────────────
+    # Memory-backed today, so these just return the sync lookups; a SQL-backed
+    # store would issue one query each (get_weather_day: a single
+    # `WHERE hour BETWEEN 0 AND 23` round trip instead of 24).
+
+    async def aget_weather(self, city: str, month: int, hour: int) -> dict:
+        return self.get_weather(city, month, hour)
+
+    async def aget_weather_day(self, city: str, month: int) -> np.ndarray:
+        return self.get_weather_day(city, month)
 
     def get_seasonal_multiplier(self, month: int) -> float:
         return self._seasonal.get(month, 1.0)
 
+    def _zone_band(self, city: str, lat_lo: float, lat_hi: float) -> Optional[np.ndarray]:
+        """
+        Indexes (in load order) of the zones that can cover a point with
+        latitude in [lat_lo, lat_hi] radians, or None to test them all.
+        """
+        band = self._zone_lat_sorted.get(city)
+        if band is None or len(band[1]) <= _ZONE_BAND_MIN:
+            return None
+        lats_sorted, order, max_radius = band
+        lo = np.searchsorted(lats_sorted, lat_lo - max_radius, side="left")
+        hi = np.searchsorted(lats_sorted, lat_hi + max_radius, side="right")
+        # Back to load order so ties still go to the first zone listed
+        return np.sort(order[lo:hi])
+
+    def _zone_grid_codes(self, city: str, lat_rad: np.ndarray, lon_rad: np.ndarray) -> np.ndarray:
+        """Grid codes (see _build_zone_grid) for points in radians; 0 if the city has no grid."""
+        grid = self._zone_grid.get(city)
+        if grid is None:
+            return np.zeros(lat_rad.shape, dtype=np.uint8)
+        lat_lo, lon_lo, dlat, dlon, codes = grid
+        i = np.floor((lat_rad - lat_lo) / dlat)
+        j = np.floor((lon_rad - lon_lo) / dlon)
+        n = codes.shape[0]
+        in_box = (i >= 0) & (i < n) & (j >= 0) & (j < n)
+        out = np.full(lat_rad.shape, _ZONE_GRID_OUTSIDE, dtype=np.uint8)
+        out[in_box] = codes[i[in_box].astype(np.intp), j[in_box].astype(np.intp)]
+        return out
+
     def get_zone_for_coords(self, city: str, lat: float, lon: float) -> str:
         """Determine which traffic zone a coordinate falls in."""
+        # A handful of zones per city: NumPy call overhead would outweigh the
+        # math, so read the grid cell and walk the precomputed radians/cosines
+        # as plain floats
         city_lower = city.lower()
-        zones = self._zones.get(city_lower, [])
+        lat0 = math.radians(lat)
+        lon0 = math.radians(lon)
+        zones = self._zones_rad.get(city_lower, ())
+        grid = self._zone_grid.get(city_lower)
+        if grid is not None:
+            lat_lo, lon_lo, dlat, dlon, codes = grid
+            i = math.floor((lat0 - lat_lo) / dlat)
+            j = math.floor((lon0 - lon_lo) / dlon)
+            n = codes.shape[0]
+            code = codes.item(i, j) if 0 <= i < n and 0 <= j < n else _ZONE_GRID_OUTSIDE
+            if code == _ZONE_GRID_OUTSIDE:
+                return "Central"
+            if code:
+                return zones[code - 1][4]
+        cos0 = math.cos(lat0)
+        candidates = self._zone_band(city_lower, lat0, lat0)
+        if candidates is not None:
+            zones = [zones[i] for i in candidates.tolist()]
         best_zone = "Central"
         best_dist = float("inf")
-        for z in zones:
-            dist = haversine_km(lat, lon, z["lat"], z["lon"])
-            if dist < z["radius_km"] and dist < best_dist:
+        for zlat, zlon, zcos, zrad, name in zones:
+            a = math.sin((zlat - lat0) / 2)**2 + cos0 * \
+                zcos * math.sin((zlon - lon0) / 2)**2
+            dist = 6371.0 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+            if dist < zrad and dist < best_dist:
                 best_dist = dist
-                best_zone = z["zone"]
+                best_zone = name
         return best_zone
 
+    def get_zones_for_coords(self, city: str, lats, lons) -> List[str]:
+        """Vectorized get_zone_for_coords: one zone name per (lat, lon) point."""
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        city_lower = city.lower()
+        zones = self._zones_np.get(city_lower)
+        if zones is None or not len(zones[4]) or not lats.size:
+            return ["Central"] * lats.size
+        names = zones[4]
+        # Grid cells settle most points; the rest take the exact test
+        codes = self._zone_grid_codes(city_lower, np.radians(lats), np.radians(lons))
+        result = ["Central" if c == _ZONE_GRID_OUTSIDE else names[c - 1] if c else None
+                  for c in codes.tolist()]
+        undecided = np.flatnonzero(codes == 0)
+        if len(undecided):
+            exact = self._zones_exact(city_lower, lats[undecided], lons[undecided])
+            for k, zone in zip(undecided.tolist(), exact):
+                result[k] = zone
+        return result
+
+    def _zones_exact(self, city_lower: str, lats: np.ndarray, lons: np.ndarray) -> List[str]:
+        """get_zones_for_coords by distance to every candidate zone center."""
+        lat_rad, lon_rad, cos_lat, radius_km, names = self._zones_np[city_lower]
+        lat0 = np.radians(lats).reshape(-1, 1)
+        # Only the zones in the batch's latitude band can match
+        candidates = self._zone_band(city_lower, float(lat0.min()), float(lat0.max()))
+        if candidates is not None:
+            if not len(candidates):
+                return ["Central"] * lats.size
+            lat_rad, lon_rad, cos_lat, radius_km = (
+                arr[candidates] for arr in (lat_rad, lon_rad, cos_lat, radius_km))
+            names = [names[i] for i in candidates.tolist()]
+        # (points, zones) haversine distances in one broadcast
+        lon0 = np.radians(np.asarray(lons, dtype=float)).reshape(-1, 1)
+        a = np.sin((lat_rad - lat0) / 2)**2 + np.cos(lat0) * \
+            cos_lat * np.sin((lon_rad - lon0) / 2)**2
+        dist = 6371.0 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        # Nearest zone whose radius covers the point; argmin keeps the first on ties
+        dist[dist >= radius_km] = np.inf
+        best = np.argmin(dist, axis=1)
+        covered = np.isfinite(dist[np.arange(len(best)), best])
+        return [names[b] if ok else "Central" for b, ok in zip(best.tolist(), covered.tolist())]
+
     def get_event_congestion_multiplier(self, city: str, zone: str, day_name: str) -> float:
         """Check if any venue event might affect this zone on this day."""
-        city_lower = city.lower()
         max_mult = 1.0
-        for v in self.venues:
-            if v["city"].lower() == city_lower and v["affected_zone"] == zone:
-                if day_name in v["typical_event_days"]:
-                    max_mult = max(max_mult, float(v["congestion_multiplier"]))
+        for v in self._venues_by_city_zone.get((city.lower(), zone), ()):
+            if day_name in v["event_days_set"]:
+                max_mult = max(max_mult, float(v["congestion_multiplier"]))
         return max_mult
 
 
@@ -11,8 +11,9 @@ Impact Score per leg =
 Preference modes adjust these weights.
 """
 
-from typing import Dict, List, Optional
-from engine.data_loader import get_data_store
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from engine.data_loader import get_data_store, peak_hours_mask
 
 
 # ── Weight Profiles by Preference Mode ───────────────────
@@ -38,18 +39,41 @@ WEIGHT_PROFILES = {
     },
 }
 
+# Same profiles as a dense (mode, component) matrix for array kernels.
+# Row order matches api.schemas.PreferenceMode; unknown modes use balanced.
+MODE_INDEX = {"comfort": 0, "fastest": 1, "balanced": 2}
+COMPONENTS = ("traffic", "heat", "crowd", "volatility")
+WEIGHT_MATRIX = np.array([
+    [WEIGHT_PROFILES[mode][c] for c in COMPONENTS]
+    for mode in sorted(MODE_INDEX, key=MODE_INDEX.get)
+])
+_WEIGHT_ROWS: Tuple[Tuple[float, ...], ...] = tuple(map(tuple, WEIGHT_MATRIX.tolist()))
+
+
+def resolve_weights(preference_mode: str) -> Tuple[float, float, float, float]:
+    """(traffic, heat, crowd, volatility) weights for a mode; unknown modes use balanced."""
+    return _WEIGHT_ROWS[MODE_INDEX.get(preference_mode, MODE_INDEX["balanced"])]
+
+
+def _peak_mask(attraction: dict) -> int:
+    """Peak-hour bitmask, precomputed at load; built on the fly for ad-hoc dicts."""
+    mask = attraction.get("peak_hours_mask")
+    if mask is None:
+        mask = peak_hours_mask(attraction.get("peak_hours", []))
+    return mask
+
 
 def compute_crowd_factor(attraction: dict, arrival_hour: int) -> float:
     """
     Compute crowd factor (0-1) for an attraction at a given hour.
     Uses peak_hours data and ideal time windows.
     """
-    peak_hours = attraction.get("peak_hours", [])
+    peak_mask = _peak_mask(attraction)
     ideal_start = attraction.get("ideal_time_start", 9)
     ideal_end = attraction.get("ideal_time_end", 18)
 
     # Base crowd level from time-of-day
-    if arrival_hour in peak_hours:
+    if (peak_mask >> arrival_hour) & 1:
         base_crowd = 0.85
     elif ideal_start <= arrival_hour <= ideal_end:
         base_crowd = 0.40
@@ -64,7 +88,7 @@ def compute_crowd_factor(attraction: dict, arrival_hour: int) -> float:
     # Weighted combination
     crowd = base_crowd * 0.7 + popularity_factor * 0.3
 
-    return round(min(crowd, 1.0), 3)
+    return min(crowd, 1.0)
 
 
 def compute_traffic_volatility(traffic_index: float, hour: int) -> float:
@@ -86,7 +110,19 @@ def compute_traffic_volatility(traffic_index: float, hour: int) -> float:
     # Higher congestion = more volatility
     congestion_vol = traffic_index * 0.4
 
-    return round(min(base_vol + congestion_vol, 1.0), 3)
+    return min(base_vol + congestion_vol, 1.0)
+
+
+def _heat_exposure(attraction: dict) -> float:
+    """Share of the ambient heat discomfort a visitor of this attraction feels."""
+    if attraction.get("heat_sensitive", False) or attraction.get("category", "") == "outdoor":
+        # Full heat impact for outdoor/heat-sensitive attractions
+        return 1.0
+    if attraction.get("category", "") == "indoor":
+        # Indoor attractions: minimal heat impact (just travel exposure)
+        return 0.2
+    # Landmarks, markets: moderate
+    return 0.5
 
 
 def compute_heat_impact(
@@ -98,20 +134,51 @@ def compute_heat_impact(
     """
     store = get_data_store()
     weather = store.get_weather(city, month, hour)
-    heat_discomfort = weather["heat_discomfort"]
+    return weather["heat_discomfort"] * _heat_exposure(attraction)
 
-    is_heat_sensitive = attraction.get("heat_sensitive", False)
-    category = attraction.get("category", "")
 
-    if is_heat_sensitive or category == "outdoor":
-        # Full heat impact for outdoor/heat-sensitive attractions
-        return heat_discomfort
-    elif category == "indoor":
-        # Indoor attractions: minimal heat impact (just travel exposure)
-        return heat_discomfort * 0.2
-    else:
-        # Landmarks, markets: moderate
-        return heat_discomfort * 0.5
+# ── Whole-day tables ─────────────────────────────────────
+# Heat and crowd terms depend only on (attraction, arrival hour), not on the
+# route, so the optimizer computes all 24 hours per attraction up front with
+# array ops and indexes them per leg.
+
+_HOURS = np.arange(24)
+
+
+def compute_heat_impact_by_hour(city: str, month: int, attraction: dict) -> List[float]:
+    """compute_heat_impact for arrival hours 0-23."""
+    store = get_data_store()
+    if not 1 <= month <= 12:
+        return [compute_heat_impact(city, month, h, attraction) for h in range(24)]
+    heat_discomfort = store.get_weather_day(city, month)[:, 1]
+    return (heat_discomfort * _heat_exposure(attraction)).tolist()
+
+
+def compute_crowd_factor_by_hour(attraction: dict) -> List[float]:
+    """compute_crowd_factor for arrival hours 0-23."""
+    peak_mask = _peak_mask(attraction)
+    ideal_start = attraction.get("ideal_time_start", 9)
+    ideal_end = attraction.get("ideal_time_end", 18)
+
+    base_crowd = np.where(
+        ((peak_mask >> _HOURS) & 1).astype(bool), 0.85,
+        np.where((ideal_start <= _HOURS) & (_HOURS <= ideal_end), 0.40, 0.15))
+    priority = attraction.get("priority_score", 5.0)
+    popularity_factor = min(priority / 10.0, 1.0)
+    crowd = np.minimum(base_crowd * 0.7 + popularity_factor * 0.3, 1.0)
+    return crowd.tolist()
+
+
+def _leg_score_kernel(
+    w_traffic: float, w_heat: float, w_crowd: float, w_volatility: float,
+    traffic: float, heat: float, crowd: float, volatility: float,
+) -> Tuple[float, float, float, float, float]:
+    """Weighted leg score as plain floats: (total, traffic, heat, crowd, volatility)."""
+    c_traffic = w_traffic * traffic
+    c_heat = w_heat * heat
+    c_crowd = w_crowd * crowd
+    c_volatility = w_volatility * volatility
+    return c_traffic + c_heat + c_crowd + c_volatility, c_traffic, c_heat, c_crowd, c_volatility
 
 
 def compute_leg_impact_score(
@@ -120,31 +187,31 @@ def compute_leg_impact_score(
     crowd_factor: float,
     traffic_volatility: float,
     preference_mode: str = "balanced",
+    weights: Optional[Tuple[float, float, float, float]] = None,
 ) -> dict:
     """
     Compute the Travel Impact Score for a single leg.
 
+    Callers scoring many legs in one mode pass `weights` (from
+    resolve_weights) so the mode is looked up once, not per leg.
+
     Returns dict with component scores and total.
     """
-    weights = WEIGHT_PROFILES.get(preference_mode, WEIGHT_PROFILES["balanced"])
-
-    total = (
-        weights["traffic"] * travel_traffic_index +
-        weights["heat"] * heat_impact +
-        weights["crowd"] * crowd_factor +
-        weights["volatility"] * traffic_volatility
-    )
+    if weights is None:
+        weights = resolve_weights(preference_mode)
+    total, c_traffic, c_heat, c_crowd, c_volatility = _leg_score_kernel(
+        *weights, travel_traffic_index, heat_impact, crowd_factor, traffic_volatility)
 
     return {
-        "total_score": round(total, 4),
-        "traffic_component": round(weights["traffic"] * travel_traffic_index, 4),
-        "heat_component": round(weights["heat"] * heat_impact, 4),
-        "crowd_component": round(weights["crowd"] * crowd_factor, 4),
-        "volatility_component": round(weights["volatility"] * traffic_volatility, 4),
-        "raw_traffic": round(travel_traffic_index, 3),
-        "raw_heat": round(heat_impact, 3),
-        "raw_crowd": round(crowd_factor, 3),
-        "raw_volatility": round(traffic_volatility, 3),
+        "total_score": total,
+        "traffic_component": c_traffic,
+        "heat_component": c_heat,
+        "crowd_component": c_crowd,
+        "volatility_component": c_volatility,
+        "raw_traffic": travel_traffic_index,
+        "raw_heat": heat_impact,
+        "raw_crowd": crowd_factor,
+        "raw_volatility": traffic_volatility,
     }
 
 
@@ -157,16 +224,42 @@ def compute_itinerary_score(leg_scores: List[dict]) -> dict:
 
     totals = [leg["total_score"] for leg in leg_scores]
 
+    total = sum(totals)
     return {
-        "total_score": round(sum(totals), 4),
-        "avg_score": round(sum(totals) / len(totals), 4),
-        "max_score": round(max(totals), 4),
-        "min_score": round(min(totals), 4),
+        "total_score": total,
+        "avg_score": total / len(totals),
+        "max_score": max(totals),
+        "min_score": min(totals),
         "legs": len(leg_scores),
         "components": {
-            "traffic": round(sum(l["traffic_component"] for l in leg_scores), 4),
-            "heat": round(sum(l["heat_component"] for l in leg_scores), 4),
-            "crowd": round(sum(l["crowd_component"] for l in leg_scores), 4),
-            "volatility": round(sum(l["volatility_component"] for l in leg_scores), 4),
+            "traffic": sum(l["traffic_component"] for l in leg_scores),
+            "heat": sum(l["heat_component"] for l in leg_scores),
+            "crowd": sum(l["crowd_component"] for l in leg_scores),
+            "volatility": sum(l["volatility_component"] for l in leg_scores),
         }
     }
+
+
+# ── Display Rounding ─────────────────────────────────────
+# Scores stay full precision while routes are compared (rounding per leg
+# costs time and can reorder near-ties); these round for serialization.
+
+def round_leg_score(score: dict) -> dict:
+    """compute_leg_impact_score result rounded for display."""
+    return {
+        key: round(value, 3 if key.startswith("raw_") else 4)
+        for key, value in score.items()
+    }
+
+
+def round_itinerary_score(score: dict) -> dict:
+    """compute_itinerary_score result rounded for display."""
+    rounded = {
+        key: round(value, 4) if isinstance(value, float) else value
+        for key, value in score.items()
+        if key != "components"
+    }
+    if "components" in score:
+        rounded["components"] = {
+            key: round(value, 4) for key, value in score["components"].items()}
+    return rounded
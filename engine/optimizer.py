@@ -4,35 +4,60 @@ The core computational component that simulates all route permutations
 and selects the itinerary with the lowest Travel Impact Score.
 
 Architecture:
-    Step 1: Generate all permutations of N attractions (N! for 3-5 = 6-120)
-    Step 2: For each permutation, simulate the full timeline
-    Step 3: Compute Travel Impact Score for each
+    Step 1: Walk all orderings of N attractions depth-first (N! for 3-5 = 6-120)
+    Step 2: Simulate each leg once per shared route prefix, not once per permutation
+    Step 3: Compute Travel Impact Score for each complete route
     Step 4: Select the route with the lowest total score
+            (optionally pruning prefixes that already score worse than the best)
 """
 
-import itertools
+import math
 import time as time_module
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from functools import partial
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from engine.data_loader import get_data_store
-from engine.travel_estimator import estimate_travel_time
+import numpy as np
+from engine.data_loader import get_data_store, haversine_km, peak_hours_mask
+from engine.travel_estimator import (
+    _travel_stack, city_params, estimate_travel_time,
+)
 from engine.impact_score import (
-    compute_crowd_factor,
+    compute_crowd_factor_by_hour,
     compute_traffic_volatility,
-    compute_heat_impact,
+    compute_heat_impact_by_hour,
     compute_leg_impact_score,
     compute_itinerary_score,
+    resolve_weights,
+    _leg_score_kernel,
+    round_itinerary_score,
+    round_leg_score,
 )
 
 
+# Maximum attractions per itinerary (the API enforces the same bound)
+MAX_ATTRACTIONS = 7
+
+# Rush hours as bitmasks over the 24 hours of the day (bit h <=> hour h)
+_MORNING_RUSH_MASK = peak_hours_mask(range(7, 10))    # 7-9 AM
+_EVENING_RUSH_MASK = peak_hours_mask(range(17, 21))   # 5-8 PM
+_RUSH_MASK = _MORNING_RUSH_MASK | _EVENING_RUSH_MASK
+
+# Slack when comparing a partial route against the best total: sums of the
+# same legs in a different order can differ in the last bits, so only prune
+# prefixes that are clearly worse
+_PRUNE_EPS = 1e-9
+
+
 # ── Data Classes ─────────────────────────────────────────
 
+@dataclass(slots=True)
 class TimeSlot:
     """Represents a time window in the itinerary."""
 
-    def __init__(self, start: datetime, end: datetime):
-        self.start = start
-        self.end = end
+    start: datetime
+    end: datetime
 
     @property
     def duration_minutes(self) -> float:
@@ -42,22 +67,24 @@ class TimeSlot:
         return f"{self.start.strftime('%H:%M')}-{self.end.strftime('%H:%M')}"
 
 
+@dataclass(slots=True)
 class ItineraryLeg:
     """Represents one segment: travel + visit at destination."""
 
-    def __init__(self):
-        self.attraction_id: str = ""
-        self.attraction_name: str = ""
-        self.travel_from: str = ""      # origin name
-        self.travel_start: datetime = None
-        self.travel_end: datetime = None
-        self.travel_duration_min: float = 0
-        self.travel_distance_km: float = 0
-        self.visit_start: datetime = None
-        self.visit_end: datetime = None
-        self.visit_duration_min: float = 0
-        self.impact_score: dict = {}
-        self.travel_details: dict = {}
+    attraction_id: str = ""
+    attraction_name: str = ""
+    travel_from: str = ""      # origin name
+    travel_start: Optional[datetime] = None
+    travel_end: Optional[datetime] = None
+    travel_duration_min: float = 0
+    travel_distance_km: float = 0
+    visit_start: Optional[datetime] = None
+    visit_end: Optional[datetime] = None
+    visit_duration_min: float = 0
+    impact_score: dict = field(default_factory=dict)
+    travel_details: dict = field(default_factory=dict)
+    # The destination's attraction record, so later passes needn't look it up
+    attraction_ref: Optional[dict] = field(default=None, repr=False, compare=False)
 
     def to_dict(self) -> dict:
         return {
@@ -71,27 +98,27 @@ class ItineraryLeg:
             "visit_start": self.visit_start.strftime("%H:%M") if self.visit_start else None,
             "visit_end": self.visit_end.strftime("%H:%M") if self.visit_end else None,
             "visit_duration_min": round(self.visit_duration_min),
-            "impact_score": self.impact_score,
+            "impact_score": round_leg_score(self.impact_score),
         }
 
 
+@dataclass(slots=True)
 class OptimizationResult:
     """Complete result from the optimizer."""
 
-    def __init__(self):
-        self.ordered_route: List[dict] = []
-        self.timeline: List[dict] = []
-        self.total_travel_time: float = 0
-        self.total_visit_time: float = 0
-        self.total_impact_score: float = 0
-        self.impact_breakdown: dict = {}
-        self.itinerary_start: str = ""
-        self.itinerary_end: str = ""
-        self.permutations_evaluated: int = 0
-        self.computation_time_ms: float = 0
-        self.explanation: str = ""
-        # For debugging: scores of all permutations
-        self.all_scores: List[dict] = []
+    ordered_route: List[dict] = field(default_factory=list)
+    timeline: List[dict] = field(default_factory=list)
+    total_travel_time: float = 0
+    total_visit_time: float = 0
+    total_impact_score: float = 0
+    impact_breakdown: dict = field(default_factory=dict)
+    itinerary_start: str = ""
+    itinerary_end: str = ""
+    permutations_evaluated: int = 0
+    computation_time_ms: float = 0
+    explanation: str = ""
+    # For debugging: scores of all permutations
+    all_scores: List[dict] = field(default_factory=list)
 
     def to_dict(self) -> dict:
         return {
@@ -101,7 +128,7 @@ class OptimizationResult:
             "total_visit_time_min": round(self.total_visit_time, 1),
             "total_duration_min": round(self.total_travel_time + self.total_visit_time, 1),
             "total_impact_score": round(self.total_impact_score, 4),
-            "impact_breakdown": self.impact_breakdown,
+            "impact_breakdown": round_itinerary_score(self.impact_breakdown),
             "itinerary_start": self.itinerary_start,
             "itinerary_end": self.itinerary_end,
             "permutations_evaluated": self.permutations_evaluated,
@@ -112,6 +139,145 @@ class OptimizationResult:
 
 # ── Timeline Simulator ───────────────────────────────────
 
+def _day_context(date: datetime) -> Tuple[int, str, str]:
+    """(month, day name, day type) for a date, fixed for a whole itinerary."""
+    day_type = "weekend" if date.weekday() >= 5 else "weekday"
+    return date.month, date.strftime("%A"), day_type
+
+
+def _hop_traffic(traffic_index: float, hour: int, event_mult: float) -> Tuple[float, float]:
+    """(traffic, volatility) components of a hop departing at `hour`."""
+    traffic_vol = compute_traffic_volatility(traffic_index, hour)
+
+    # Event congestion check
+    if event_mult > 1.0:
+        traffic_index = min(traffic_index * event_mult, 1.0)
+        traffic_vol = min(traffic_vol * 1.2, 1.0)
+    return traffic_index, traffic_vol
+
+
+def _leg_components(
+    attr: dict,
+    current_time: datetime,
+    travel: dict,
+    event_mult: float,
+    heat_by_hour: List[float],
+    crowd_by_hour: List[float],
+) -> Tuple[datetime, datetime, float, float, float, float]:
+    """
+    Time one leg (travel from the current position, then visit `attr`) and
+    compute its raw impact components.
+
+    `travel` is the estimate_travel_time result for this hop at the current
+    hour and `event_mult` the event congestion multiplier at the destination's
+    zone; `heat_by_hour` / `crowd_by_hour` are the destination's 24-hour
+    heat impact and crowd factor tables. The leg depends only on those, the
+    current time and the destination, so routes sharing a prefix can share
+    its legs.
+
+    Returns (arrival, visit end, traffic, heat, crowd, volatility). The
+    route search inlines the same steps over per-request precomputed hops.
+    """
+    arrival = current_time + timedelta(minutes=travel["duration_minutes"])
+    visit_end = arrival + timedelta(minutes=attr.get("average_visit_duration", 60))
+    traffic_index, traffic_vol = _hop_traffic(
+        travel["traffic_index"], current_time.hour, event_mult)
+    return (arrival, visit_end, traffic_index,
+            heat_by_hour[arrival.hour], crowd_by_hour[arrival.hour], traffic_vol)
+
+
+def _simulate_leg(
+    attr_id: str,
+    attr: dict,
+    current_time: datetime,
+    current_name: str,
+    travel: dict,
+    event_mult: float,
+    heat_by_hour: List[float],
+    crowd_by_hour: List[float],
+    weights: Tuple[float, float, float, float],
+) -> Tuple[ItineraryLeg, dict]:
+    """Simulate one leg as a full ItineraryLeg plus its score (see _leg_components)."""
+    arrival, visit_end, *components = _leg_components(
+        attr, current_time, travel, event_mult, heat_by_hour, crowd_by_hour)
+    score = compute_leg_impact_score(*components, weights=weights)
+    leg = ItineraryLeg(
+        attraction_id=attr_id,
+        attraction_name=attr["name"],
+        travel_from=current_name,
+        travel_start=current_time,
+        travel_end=arrival,
+        travel_duration_min=travel["duration_minutes"],
+        travel_distance_km=travel["distance_km"],
+        visit_start=arrival,
+        visit_end=visit_end,
+        visit_duration_min=attr.get("average_visit_duration", 60),
+        impact_score=score,
+        travel_details=travel,
+        attraction_ref=attr,
+    )
+    return leg, score
+
+
+def _itinerary_hours(points: list, attrs: List[dict], city: str, start_hour: int) -> range:
+    """
+    Hours of the day any leg of any ordering can touch: from the start hour
+    to the latest possible end, assuming every leg is the longest pair
+    distance driven at the slowest (floor) speed.
+    """
+    _, congested, detour = city_params(city.lower())
+    max_km = max(
+        max(haversine_km(a[0], a[1], b[0], b[1]) * detour, 0.3)
+        for a in points for b in points
+    )
+    max_travel_min = max_km / (congested * 0.7) * 60 + 1
+    total_min = sum(a.get("average_visit_duration", 60) + max_travel_min for a in attrs)
+    end_hour = start_hour + int(total_min // 60) + 1
+    if end_hour >= 24:
+        return range(24)  # wraps past midnight
+    return range(start_hour, end_hour + 1)
+
+
+def _leg_lower_bound(
+    store,
+    attr: dict,
+    origin_zones: set,
+    hours: range,
+    city: str,
+    month: int,
+    day_type: str,
+    preference_mode: str,
+) -> float:
+    """
+    Lower bound on the impact score of any leg ending at `attr`, whatever
+    the origin (one of `origin_zones`) and departure/arrival hour (in `hours`).
+
+    Each component is minimized independently over those hours, and the
+    event multiplier can only raise traffic, so the bound is admissible.
+    """
+    dest_zone = store.get_zone_for_coords(city, attr["latitude"], attr["longitude"])
+    heat_by_hour = compute_heat_impact_by_hour(city, month, attr)
+    crowd_by_hour = compute_crowd_factor_by_hour(attr)
+    seasonal = store.get_seasonal_multiplier(month)
+
+    traffic_by_hour = []
+    for h in hours:
+        dest_traffic = store.get_traffic_index(city, dest_zone, day_type, h)
+        origin_traffic = min(
+            store.get_traffic_index(city, z, day_type, h) for z in origin_zones)
+        # Rounded like the traffic_index estimate_travel_time reports
+        traffic_by_hour.append(round(min((origin_traffic + dest_traffic) / 2 * seasonal, 1.0), 3))
+
+    score = compute_leg_impact_score(
+        min(traffic_by_hour),
+        min(heat_by_hour[h] for h in hours),
+        min(crowd_by_hour[h] for h in hours),
+        min(compute_traffic_volatility(t, h) for h, t in zip(hours, traffic_by_hour)),
+        preference_mode,
+    )
+    return score["total_score"] - _PRUNE_EPS
+
+
 def simulate_timeline(
     start_lat: float,
     start_lon: float,
@@ -120,6 +286,7 @@ def simulate_timeline(
     date: datetime,
     start_hour: int = 9,
     preference_mode: str = "balanced",
+    build_legs: bool = True,
 ) -> Tuple[List[ItineraryLeg], dict]:
     """
     Simulate a complete itinerary timeline for a given attraction ordering.
@@ -131,14 +298,14 @@ def simulate_timeline(
         date: Date of the itinerary
         start_hour: Hour to start the itinerary (default 9 AM)
         preference_mode: comfort / fastest / balanced
+        build_legs: Build the ItineraryLeg timeline; when False only the
+            score is computed and the leg list comes back empty
 
     Returns:
         Tuple of (list of ItineraryLeg, itinerary_score dict)
     """
     store = get_data_store()
-    month = date.month
-    day_name = date.strftime("%A")
-    day_type = "weekend" if date.weekday() >= 5 else "weekday"
+    month, day_name, day_type = _day_context(date)
 
     current_time = date.replace(
         hour=start_hour, minute=0, second=0, microsecond=0)
@@ -146,6 +313,7 @@ def simulate_timeline(
     current_lon = start_lon
     current_name = "Start Location"
 
+    weights = resolve_weights(preference_mode)
     legs: List[ItineraryLeg] = []
     leg_scores: List[dict] = []
 
@@ -154,60 +322,33 @@ def simulate_timeline(
         if not attr:
             continue
 
-        leg = ItineraryLeg()
-        leg.attraction_id = attr_id
-        leg.attraction_name = attr["name"]
-        leg.travel_from = current_name
-
-        # ── Travel Phase ──
-        current_hour = current_time.hour
         travel = estimate_travel_time(
             current_lat, current_lon,
             attr["latitude"], attr["longitude"],
-            city, current_hour, day_type, month,
+            city, current_time.hour, day_type, month,
         )
-
-        leg.travel_start = current_time
-        travel_minutes = travel["duration_minutes"]
-        leg.travel_duration_min = travel_minutes
-        leg.travel_distance_km = travel["distance_km"]
-        leg.travel_end = current_time + timedelta(minutes=travel_minutes)
-        leg.travel_details = travel
-
-        # ── Visit Phase ──
-        leg.visit_start = leg.travel_end
-        visit_duration = attr.get("average_visit_duration", 60)
-        leg.visit_duration_min = visit_duration
-        leg.visit_end = leg.visit_start + timedelta(minutes=visit_duration)
-
-        # ── Impact Score ──
-        arrival_hour = leg.visit_start.hour
-        traffic_index = travel["traffic_index"]
-        heat_impact = compute_heat_impact(city, month, arrival_hour, attr)
-        crowd_factor = compute_crowd_factor(attr, arrival_hour)
-        traffic_vol = compute_traffic_volatility(traffic_index, current_hour)
-
-        # Event congestion check
         event_mult = store.get_event_congestion_multiplier(
-            city, travel.get("dest_zone", "Central"), day_name
-        )
-        if event_mult > 1.0:
-            traffic_index = min(traffic_index * event_mult, 1.0)
-            traffic_vol = min(traffic_vol * 1.2, 1.0)
-
-        score = compute_leg_impact_score(
-            traffic_index, heat_impact, crowd_factor, traffic_vol,
-            preference_mode
-        )
-        leg.impact_score = score
+            city, travel.get("dest_zone", "Central"), day_name)
+        heat_by_hour = compute_heat_impact_by_hour(city, month, attr)
+        crowd_by_hour = compute_crowd_factor_by_hour(attr)
+        if build_legs:
+            leg, score = _simulate_leg(
+                attr_id, attr, current_time, current_name, travel, event_mult,
+                heat_by_hour, crowd_by_hour, weights,
+            )
+            legs.append(leg)
+            visit_end = leg.visit_end
+        else:
+            _, visit_end, *components = _leg_components(
+                attr, current_time, travel, event_mult, heat_by_hour, crowd_by_hour)
+            score = compute_leg_impact_score(*components, weights=weights)
         leg_scores.append(score)
 
         # ── Advance state ──
-        current_time = leg.visit_end
+        current_time = visit_end
         current_lat = attr["latitude"]
         current_lon = attr["longitude"]
         current_name = attr["name"]
-        legs.append(leg)
 
     itinerary_score = compute_itinerary_score(leg_scores)
     return legs, itinerary_score
@@ -215,6 +356,159 @@ def simulate_timeline(
 
 # ── Permutation Optimizer ─────────────────────────────────
 
+def _search_routes(
+    start_lat: float,
+    start_lon: float,
+    valid_ids: List[str],
+    city: str,
+    date: datetime,
+    start_hour: int,
+    preference_mode: str,
+    prune: bool,
+    keep_all_scores: bool,
+    first_stops: Optional[List[int]] = None,
+) -> Tuple[int, float, Optional[List[int]], float, list]:
+    """
+    Search the orderings of `valid_ids` (all, or those starting with one of
+    `first_stops`, as indexes into valid_ids) for the lowest total score.
+
+    Module-level so optimize_itinerary can hand slices of the search to
+    worker processes. Returns (routes completed, best total, best route,
+    worst total, compact (total, avg, route) records).
+    """
+    store = get_data_store()
+    n = len(valid_ids)
+    attrs = [store.get_attraction(aid) for aid in valid_ids]
+    month, day_name, day_type = _day_context(date)
+    start_time = date.replace(
+        hour=start_hour, minute=0, second=0, microsecond=0)
+
+    # Travel estimates only depend on (origin, destination, departure hour)
+    # for a given request, so every hop's minutes and traffic come from one
+    # (24, n+1, n+1) stack, and each is resolved once, straight to what
+    # scoring needs, and shared by every route. Point 0 is the start
+    # location, point i + 1 is attrs[i].
+    points = [(start_lat, start_lon)] + [(a["latitude"], a["longitude"]) for a in attrs]
+    attr_lats, attr_lons = store.coords_of(valid_ids)
+    stack_minutes, stack_traffic = (a.tolist() for a in _travel_stack(
+        np.concatenate(([start_lat], attr_lats)), np.concatenate(([start_lon], attr_lons)),
+        city, day_type, month))
+    hop_cache: Dict[Tuple[int, int, int], Tuple[timedelta, float, float]] = {}
+
+    # The day is fixed, so each destination's event multiplier is too
+    event_mults = [
+        store.get_event_congestion_multiplier(
+            city, store.get_zone_for_coords(city, lat, lon), day_name)
+        for lat, lon in points[1:]
+    ]
+
+    # Heat and crowd only depend on the arrival hour, so tabulate both
+    heat_tables = [compute_heat_impact_by_hour(city, month, a) for a in attrs]
+    crowd_tables = [compute_crowd_factor_by_hour(a) for a in attrs]
+    visit_deltas = [timedelta(minutes=a.get("average_visit_duration", 60)) for a in attrs]
+    w_traffic, w_heat, w_crowd, w_volatility = resolve_weights(preference_mode)
+
+    def hop(origin: int, dest: int, hour: int) -> Tuple[timedelta, float, float]:
+        """(travel time, traffic, volatility) for a hop departing at `hour`."""
+        key = (origin, dest, hour)
+        resolved = hop_cache.get(key)
+        if resolved is None:
+            # Rounded as estimate_travel_time reports them
+            resolved = hop_cache[key] = (
+                timedelta(minutes=round(stack_minutes[hour][origin][dest], 1)),
+                *_hop_traffic(round(stack_traffic[hour][origin][dest], 3),
+                              hour, event_mults[dest - 1]),
+            )
+        return resolved
+
+    def leg(i: int, origin: int, current_time: datetime) -> Tuple[float, datetime]:
+        """(score, visit end) of the leg from `origin` to attrs[i]; see _leg_components."""
+        travel_time, traffic, volatility = hop(origin, i + 1, current_time.hour)
+        arrival = current_time + travel_time
+        score = _leg_score_kernel(
+            w_traffic, w_heat, w_crowd, w_volatility, traffic,
+            heat_tables[i][arrival.hour], crowd_tables[i][arrival.hour], volatility)[0]
+        return score, arrival + visit_deltas[i]
+
+    # Lower bound on any leg ending at each attraction, for pruning
+    lower = [0.0] * n
+    if prune:
+        origin_zones = {store.get_zone_for_coords(city, lat, lon) for lat, lon in points}
+        hours = _itinerary_hours(points, attrs, city, start_hour)
+        for i, attr in enumerate(attrs):
+            lower[i] = _leg_lower_bound(
+                store, attr, origin_zones, hours, city, month, day_type, preference_mode)
+
+    # Depth-first over orderings. Each leg is scored once per distinct
+    # prefix and reused by every route that extends it. Without pruning,
+    # routes complete in itertools.permutations order; with pruning, the
+    # cheapest child is expanded first (so a good bound is found early) and
+    # ties fall back to that order, so the winner is the same either way.
+    # Only leg totals are kept during the search; the winner's timeline is
+    # rebuilt afterwards.
+    best_score = float("inf")
+    best_route = None
+    worst_score = float("-inf")
+    num_perms = 0
+    # Compact (total, avg, route) records; names are resolved after the search
+    all_scores: List[Tuple[float, float, Tuple[int, ...]]] = []
+
+    route: List[int] = []
+
+    def extend(remaining: List[int], current_time, origin: int, partial: float):
+        nonlocal best_score, worst_score, best_route, num_perms
+
+        if not remaining:
+            # Same left-to-right sum of leg totals as compute_itinerary_score
+            total = partial
+            num_perms += 1
+            if keep_all_scores:
+                all_scores.append((total, total / n, tuple(route)))
+            if total > worst_score:
+                worst_score = total
+            if total < best_score or (total == best_score and route < best_route):
+                best_score = total
+                best_route = list(route)
+            return
+
+        rest_bound = sum(lower[i] for i in remaining)
+        if prune and partial + rest_bound > best_score + _PRUNE_EPS:
+            return
+
+        def child(pos: int, i: int):
+            score, visit_end = leg(i, origin, current_time)
+            return partial + score, pos, visit_end
+
+        # Children are scored lazily, one at a time, unless pruning has to
+        # rank them first
+        children = (child(pos, i) for pos, i in enumerate(remaining))
+        if prune:
+            children = sorted(children, key=lambda c: c[0])
+
+        for prefix_total, pos, visit_end in children:
+            i = remaining[pos]
+            # A prefix whose score plus the bound on its remaining legs
+            # already exceeds the best complete route cannot improve on it
+            if prune and prefix_total + rest_bound - lower[i] > best_score + _PRUNE_EPS:
+                continue
+
+            route.append(i)
+            extend(remaining[:pos] + remaining[pos + 1:], visit_end, i + 1, prefix_total)
+            route.pop()
+
+    if first_stops is None:
+        extend(list(range(n)), start_time, 0, 0.0)
+    else:
+        # Same as the full search, restricted to routes starting at first_stops
+        for i in first_stops:
+            score, visit_end = leg(i, 0, start_time)
+            route.append(i)
+            extend([j for j in range(n) if j != i], visit_end, i + 1, score)
+            route.pop()
+
+    return num_perms, best_score, best_route, worst_score, all_scores
+
+
 def optimize_itinerary(
     start_lat: float,
     start_lon: float,
@@ -223,10 +517,14 @@ def optimize_itinerary(
     date: datetime,
     start_hour: int = 9,
     preference_mode: str = "balanced",
+    prune: bool = False,
+    keep_all_scores: bool = True,
+    executor: Optional[Executor] = None,
 ) -> OptimizationResult:
     """
     Main optimization function.
-    Generates all permutations, simulates each, and returns the best.
+    Searches all orderings depth-first, sharing simulated route prefixes,
+    and returns the best.
 
     Args:
         start_lat, start_lon: Starting location (hotel, etc.)
@@ -235,6 +533,17 @@ def optimize_itinerary(
         date: Date of visit
         start_hour: Start time (hour, default 9)
         preference_mode: "comfort", "fastest", or "balanced"
+        prune: Skip route prefixes that already score worse than the best
+            complete route. The winner is unchanged, but all_scores and
+            permutations_evaluated then only cover the routes completed.
+        keep_all_scores: Fill result.all_scores with every route's score.
+            The explanation only needs the best and worst totals, so
+            callers that never read all_scores can turn this off.
+        executor: Process pool to split the search across, one task per
+            first stop. Each task still shares prefixes within its subtree;
+            with prune, each prunes against its own best, so more routes
+            may complete than in a single search. Callers already running
+            requests in a pool (like the API) should leave this unset.
 
     Returns:
         OptimizationResult with the optimal itinerary
@@ -257,40 +566,49 @@ def optimize_itinerary(
         result.explanation = "No valid attractions provided."
         return result
 
-    if n > 7:
+    if n > MAX_ATTRACTIONS:
         print(
-            f"  ⚠ {n} attractions = {_factorial(n)} permutations. Limiting to 7.")
-        valid_ids = valid_ids[:7]
-        n = 7
-
-    # Generate all permutations
-    all_perms = list(itertools.permutations(valid_ids))
-    num_perms = len(all_perms)
-
-    # Simulate each permutation
+            f"  ⚠ {n} attractions = {math.factorial(n)} permutations. Limiting to {MAX_ATTRACTIONS}.")
+        valid_ids = valid_ids[:MAX_ATTRACTIONS]
+        n = MAX_ATTRACTIONS
+
+    attrs = [store.get_attraction(aid) for aid in valid_ids]
+
+    if executor is None:
+        parts = [_search_routes(
+            start_lat, start_lon, valid_ids, city, date, start_hour,
+            preference_mode, prune, keep_all_scores)]
+    else:
+        search = partial(
+            _search_routes, start_lat, start_lon, valid_ids, city, date,
+            start_hour, preference_mode, prune, keep_all_scores)
+        parts = list(executor.map(search, [[i] for i in range(n)]))
+
+    # Subtrees come back in first-stop order, so concatenating them keeps
+    # the single-search route order and tie-breaking
     best_score = float("inf")
+    best_route = None
+    worst_score = float("-inf")
+    num_perms = 0
+    all_scores = []
+    for part_perms, part_best, part_route, part_worst, part_scores in parts:
+        num_perms += part_perms
+        worst_score = max(worst_score, part_worst)
+        all_scores.extend(part_scores)
+        if part_route is not None and (
+                part_best < best_score
+                or (part_best == best_score and part_route < best_route)):
+            best_score = part_best
+            best_route = part_route
+
+    # Rebuild the full timeline for the winning route only
     best_legs = None
     best_itinerary_score = None
-    best_perm = None
-    all_scores = []
-
-    for perm in all_perms:
-        legs, itin_score = simulate_timeline(
-            start_lat, start_lon,
-            list(perm), city, date, start_hour, preference_mode
+    if best_route is not None:
+        best_legs, best_itinerary_score = simulate_timeline(
+            start_lat, start_lon, [valid_ids[i] for i in best_route],
+            city, date, start_hour, preference_mode, build_legs=True,
         )
-        total = itin_score["total_score"]
-        all_scores.append({
-            "permutation": [store.get_attraction(a)["name"] for a in perm],
-            "total_score": total,
-            "avg_score": itin_score["avg_score"],
-        })
-
-        if total < best_score:
-            best_score = total
-            best_legs = legs
-            best_itinerary_score = itin_score
-            best_perm = perm
 
     t_end = time_module.perf_counter()
 
@@ -319,12 +637,22 @@ def optimize_itinerary(
         result.itinerary_end = best_legs[-1].visit_end.strftime("%H:%M")
 
         # Sort all scores to show ranking
-        all_scores.sort(key=lambda x: x["total_score"])
-        result.all_scores = all_scores
+        if keep_all_scores:
+            all_scores.sort(key=lambda x: x[0])
+            names = [a["name"] for a in attrs]
+            result.all_scores = [
+                {
+                    "permutation": [names[i] for i in perm],
+                    "total_score": total,
+                    "avg_score": avg,
+                }
+                for total, avg, perm in all_scores
+            ]
 
         # Generate explanation
         result.explanation = _generate_explanation(
-            best_legs, best_itinerary_score, all_scores, preference_mode, city, date
+            best_legs, best_itinerary_score, num_perms, best_score, worst_score,
+            preference_mode, city, date
         )
 
     return result
@@ -333,7 +661,9 @@ def optimize_itinerary(
 def _generate_explanation(
     legs: List[ItineraryLeg],
     score: dict,
-    all_scores: list,
+    total_perms: int,
+    best_total: float,
+    worst_total: float,
     preference_mode: str,
     city: str,
     date: datetime,
@@ -341,43 +671,48 @@ def _generate_explanation(
     """Generate a human-readable explanation of the optimization result."""
     store = get_data_store()
     n = len(legs)
-    total_perms = len(all_scores)
-
-    best_total = all_scores[0]["total_score"] if all_scores else 0
-    worst_total = all_scores[-1]["total_score"] if all_scores else 0
     improvement = ((worst_total - best_total) /
                    worst_total * 100) if worst_total > 0 else 0
 
     route_names = " → ".join(leg.attraction_name for leg in legs)
 
+    # One pass over the legs collects everything the insights need
+    earliest_outdoor = None     # earliest visit hour at an outdoor attraction
+    off_peak_leg = None         # first leg visited outside its peak hours
+    rush_count = 0              # legs departing in rush hour
+    total_travel = 0.0
+    total_visit = 0.0
+    for leg in legs:
+        attr = leg.attraction_ref or store.get_attraction(leg.attraction_id)
+        hour = leg.visit_start.hour
+        if attr.get("category") == "outdoor" and (
+                earliest_outdoor is None or hour < earliest_outdoor):
+            earliest_outdoor = hour
+        peak_mask = attr.get("peak_hours_mask", 0)
+        if off_peak_leg is None and peak_mask and not (peak_mask >> hour) & 1:
+            off_peak_leg = (leg, attr)
+        rush_count += (_RUSH_MASK >> leg.travel_start.hour) & 1
+        total_travel += leg.travel_duration_min
+        total_visit += leg.visit_duration_min
+
     # Identify key optimization decisions
     insights = []
 
     # Check heat avoidance
     weather = store.get_weather(city, date.month, 14)  # 2 PM temp
-    if weather["heat_discomfort"] >= 0.4:
-        outdoor_legs = [l for l in legs if store.get_attraction(
-            l.attraction_id).get("category") == "outdoor"]
-        if outdoor_legs:
-            earliest_outdoor = min(l.visit_start.hour for l in outdoor_legs)
-            if earliest_outdoor < 11:
-                insights.append(
-                    f"Outdoor attractions scheduled in morning to avoid afternoon heat ({weather['temperature']:.0f}°C at 2 PM)")
-
-    # Check crowd avoidance
-    for leg in legs:
-        attr = store.get_attraction(leg.attraction_id)
-        peak_hours = attr.get("peak_hours", [])
-        if leg.visit_start.hour not in peak_hours and peak_hours:
-            insights.append(
-                f"{leg.attraction_name} scheduled outside peak hours ({peak_hours})")
-            break  # Only mention one example
+    if weather["heat_discomfort"] >= 0.4 and earliest_outdoor is not None and earliest_outdoor < 11:
+        insights.append(
+            f"Outdoor attractions scheduled in morning to avoid afternoon heat ({weather['temperature']:.0f}°C at 2 PM)")
+
+    # Check crowd avoidance (only mention one example)
+    if off_peak_leg is not None:
+        leg, attr = off_peak_leg
+        insights.append(
+            f"{leg.attraction_name} scheduled outside peak hours ({attr.get('peak_hours', [])})")
 
     # Check traffic avoidance
-    rush_legs = [l for l in legs if 7 <= l.travel_start.hour <=
-                 9 or 17 <= l.travel_start.hour <= 20]
-    non_rush = n - len(rush_legs)
-    if non_rush > len(rush_legs):
+    non_rush = n - rush_count
+    if non_rush > rush_count:
         insights.append(f"{non_rush}/{n} travel segments avoid rush hour")
 
     insights_text = "\n".join(
@@ -390,7 +725,7 @@ Route: {route_names}
 Evaluated {total_perms} possible orderings.
 This route scores {best_total:.3f} (best) vs {worst_total:.3f} (worst) — {improvement:.1f}% stress reduction.
 
-Total travel: {sum(l.travel_duration_min for l in legs):.0f} min | Total visiting: {sum(l.visit_duration_min for l in legs):.0f} min
+Total travel: {total_travel:.0f} min | Total visiting: {total_visit:.0f} min
 
 Key optimizations:
 {insights_text}
@@ -398,9 +733,3 @@ Key optimizations:
 Impact breakdown: Traffic={score['components']['traffic']:.3f}, Heat={score['components']['heat']:.3f}, Crowds={score['components']['crowd']:.3f}, Volatility={score['components']['volatility']:.3f}"""
 
     return explanation
-
-
-def _factorial(n: int) -> int:
-    if n <= 1:
-        return 1
-    return n * _factorial(n - 1)
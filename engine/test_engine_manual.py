@@ -1,15 +1,32 @@
-from engine.data_loader import load_data
+"""
+Manual smoke run of the optimizer on a few Madrid landmarks.
+
+    SMARTTRIP_DATA_DIR=/path/to/phase1_data python -m engine.test_engine_manual
+"""
+
+from datetime import datetime
+
+from engine.data_loader import get_data_store
 from engine.optimizer import optimize_itinerary
 
-# Load dataset
-data = load_data("C:\Users\smvk2\OneDrive\Desktop\Trip_optimizer\engine\phase1_data.xlsx")
 
-# Example test query
-attractions = ["Prado Museum", "Retiro Park", "Royal Palace"]
+def main():
+    store = get_data_store()
+
+    # Example test query: Prado Museum, Retiro Park, Royal Palace
+    keywords = ["prado", "retiro", "royal palace"]
+    madrid = store.get_attractions_by_city("Madrid")
+    attraction_ids = [
+        next(a["id"] for a in madrid if keyword in a["name"].lower())
+        for keyword in keywords
+    ]
+
+    result = optimize_itinerary(
+        40.4168, -3.7038,  # Puerta del Sol
+        attraction_ids, "Madrid", datetime(2025, 6, 15),
+    )
+    print(result.explanation)
 
-result = optimize_itinerary(
-    attractions=attractions,
-    start_location="Madrid Centro"
-)
 
-print(result)
+if __name__ == "__main__":
+    main()
@@ -12,12 +12,20 @@ from engine.impact_score import (
     compute_itinerary_score,
     WEIGHT_PROFILES,
 )
-from engine.travel_estimator import estimate_travel_time, estimate_travel_matrix
+from engine.travel_estimator import (
+    estimate_travel_time, estimate_travel_matrix, estimate_travel_time_batch,
+    estimate_travel_time_stack, prepare_travel_context, reset_caches, solve_tsp_held_karp,
+    estimate_travel_matrix_with_lb, travel_minutes, _travel_stack,
+)
 from engine.data_loader import get_data_store, haversine_km
-import sys
+from engine.tsp_bb import branch_and_bound
+import itertools
 import json
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-sys.path.insert(0, "engine/phase1_data.xlsx")
 
 
 def separator(title):
@@ -38,16 +46,18 @@ def test_data_loader():
         print(f"  ✓ {city}: {len(atts)} attractions loaded")
 
     # Traffic
-    for city in ["Madrid", "Barcelona", "Seville"]:
-        idx = ds.get_traffic_index(city, "Central", "weekday", 8)
-        assert 0 < idx <= 1.0, f"Traffic index out of range: {idx}"
+    cities = ["Madrid", "Barcelona", "Seville"]
+    zones = ["Central", "North", "South", "Stadium Area", "Tourist Cluster"]
+    t = ds.traffic_index_tensor(cities, zones, "weekday")
+    assert t.shape == (3, 5, 24)
+    assert (t > 0).all() and (t <= 1.0).all(), f"Traffic index out of range: {t.min()}..{t.max()}"
+    assert t[0, 0, 8] == ds.get_traffic_index("Madrid", "Central", "weekday", 8)
     print(f"  ✓ Traffic baseline lookup working (3 cities × 5 zones × 24 hours)")
 
-    # Weather
-    for city in ["madrid", "barcelona", "seville"]:
-        w = ds.get_weather(city, 7, 14)
-        assert w["temperature"] > 20, f"July 2PM should be hot, got {w['temperature']}"
-        assert w["heat_discomfort"] > 0, f"Should have heat discomfort in July"
+    # Weather: July at 2PM, (temperature, heat_discomfort) per city
+    w = np.stack([ds.get_weather_day(city, 7)[14] for city in cities])
+    assert (w[:, 0] > 20).all(), f"July 2PM should be hot, got {w[:, 0]}"
+    assert (w[:, 1] > 0).all(), f"Should have heat discomfort in July"
     print(f"  ✓ Weather baseline working (seasonal temperature profiles)")
 
     # Zone detection
@@ -56,6 +66,46 @@ def test_data_loader():
         "Central", "Tourist Cluster"), f"Puerta del Sol should be Central/Tourist, got {zone}"
     print(f"  ✓ Zone detection working (coordinate → zone mapping)")
 
+    # Latitude band index agrees with the full scan
+    import engine.data_loader as data_loader
+    probes = [(40.4168 + d, -3.7038 + d) for d in (-0.05, -0.01, 0.0, 0.01, 0.05)]
+    full = [ds.get_zone_for_coords("Madrid", lat, lon) for lat, lon in probes]
+    band_min = data_loader._ZONE_BAND_MIN
+    data_loader._ZONE_BAND_MIN = 0
+    try:
+        assert [ds.get_zone_for_coords("Madrid", lat, lon) for lat, lon in probes] == full
+        assert ds.get_zones_for_coords(
+            "Madrid", [p[0] for p in probes], [p[1] for p in probes]) == full
+    finally:
+        data_loader._ZONE_BAND_MIN = band_min
+    print(f"  ✓ Latitude-band zone index matches full scan")
+
+    # Zone grid agrees with the exact distance test, including near edges
+    lats, lons = (g.ravel() for g in np.meshgrid(
+        np.linspace(40.36, 40.48, 61), np.linspace(-3.78, -3.62, 61)))
+    exact = ds._zones_exact("madrid", lats, lons)
+    assert ds.get_zones_for_coords("Madrid", lats, lons) == exact
+    assert [ds.get_zone_for_coords("Madrid", lat, lon)
+            for lat, lon in zip(lats.tolist(), lons.tolist())] == exact
+    print(f"  ✓ Zone grid matches exact lookup on {len(exact)} points")
+
+    # A weather cache file cut short by a concurrent rewrite is rebuilt, and
+    # rebuild=True rewrites even files that look current
+    csv_path = data_loader.DATA_DIR / "weather" / "weather_baseline.csv"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(
+            cache_dir, f"weather_v{data_loader._STORE_CACHE_VERSION}_madrid.npy")
+        with open(path, "wb") as f:
+            f.write(b"\x93NUMPY")
+        days = data_loader._load_weather_days(csv_path, cache_dir)
+        assert np.array_equal(days["madrid"][7], ds.get_weather_day("Madrid", 7))
+        assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+        del days
+        np.save(path, np.zeros((13, 24, 2)))
+        days = data_loader._load_weather_days(csv_path, cache_dir, rebuild=True)
+        assert np.array_equal(days["madrid"][7], ds.get_weather_day("Madrid", 7))
+    print(f"  ✓ Unreadable or stale weather cache rebuilt atomically")
+
     print("\n  ALL DATA LOADER TESTS PASSED ✓")
 
 
@@ -106,9 +156,101 @@ def test_travel_estimator():
     matrix = estimate_travel_matrix(locs, "Madrid", 10, "weekday", 6)
     assert len(matrix) == 3
     assert all(matrix[i][i] == 0 for i in range(3))
+    assert all(
+        matrix[i][j] == estimate_travel_time(
+            locs[i]["latitude"], locs[i]["longitude"],
+            locs[j]["latitude"], locs[j]["longitude"],
+            "Madrid", 10, "weekday", 6)["duration_minutes"]
+        for i in range(3) for j in range(3) if i != j), "Matrix should match pairwise estimates"
     print(
         f"  ✓ Travel matrix (3×3): diagonal=0, max={max(max(r) for r in matrix):.1f}min")
 
+    # Batched estimate matches the scalar path
+    o = [(l["latitude"], l["longitude"]) for l in locs]
+    d = o[1:] + o[:1]
+    batch = estimate_travel_time_batch(
+        [p[0] for p in o], [p[1] for p in o], [p[0] for p in d], [p[1] for p in d],
+        "Madrid", 8, "weekday", 7)
+    scalar = [estimate_travel_time(*a, *b, "Madrid", 8, "weekday", 7)["duration_minutes"]
+              for a, b in zip(o, d)]
+    assert batch.tolist() == scalar, f"Batch {batch.tolist()} != scalar {scalar}"
+    assert [travel_minutes(*a, *b, "Madrid", 8, "weekday", 7) for a, b in zip(o, d)] == scalar
+    print(f"  ✓ Batched estimate matches scalar: {scalar}")
+
+    # Memoized store lookups give the same answer once cleared
+    reset_caches()
+    assert estimate_travel_time(
+        40.4138, -3.6921, 40.4153, -3.6845, "Madrid", 10, "weekday", 6) == t1
+    print(f"  ✓ Lookup caches reset cleanly")
+
+    # A prepared traffic profile gives the same estimate as the store lookups
+    ctx = prepare_travel_context("Madrid", "weekday", 6)
+    assert estimate_travel_time(
+        40.4138, -3.6921, 40.4153, -3.6845, "Madrid", 10, "weekday", 6, ctx) == t1
+    assert prepare_travel_context("Madrid", "weekday", 6) is ctx
+    print(f"  ✓ Traffic profile matches store lookups")
+
+    # Coordinate columns from the store give the same matrix as dicts
+    top = ds.get_top_attractions("Madrid", limit=4)
+    assert estimate_travel_matrix(ds.coords_of([a["id"] for a in top]), "Madrid", 10) == \
+        estimate_travel_matrix(top, "Madrid", 10)
+    print(f"  ✓ Matrix from coordinate columns matches dict locations")
+
+    # Larger matrices take the vectorized law-of-cosines kernel; same minutes
+    top = ds.get_top_attractions("Madrid", limit=8)
+    big = estimate_travel_matrix(top, "Madrid", 18, "weekday", 7)
+    assert all(
+        big[i][j] == estimate_travel_time(
+            a["latitude"], a["longitude"], b["latitude"], b["longitude"],
+            "Madrid", 18, "weekday", 7)["duration_minutes"]
+        for i, a in enumerate(top) for j, b in enumerate(top) if i != j)
+    print(f"  ✓ 8×8 vectorized matrix matches pairwise estimates")
+
+    # Free-flow lower bounds never exceed the durations they bound
+    duration, lower = estimate_travel_matrix_with_lb(top, "Madrid", 3, "weekday", 1)
+    assert duration == estimate_travel_matrix(top, "Madrid", 3, "weekday", 1)
+    assert all(l <= d for lrow, drow in zip(lower, duration) for l, d in zip(lrow, drow))
+    print(f"  ✓ Free-flow lower-bound matrix bounds every duration")
+
+    # One stack covers every departure hour
+    stack = estimate_travel_time_stack(locs, "Madrid", "weekday", 6)
+    assert stack.shape == (24, 3, 3)
+    assert all(stack[h].tolist() == estimate_travel_matrix(locs, "Madrid", h, "weekday", 6)
+               for h in range(24))
+    print(f"  ✓ 24-hour stack matches per-hour matrices")
+
+    # The optimizer reads the unrounded stack; once rounded as it does, every
+    # hour and pair of random points agrees with estimate_travel_time
+    rng = np.random.default_rng(7)
+    lats, lons = rng.uniform(40.38, 40.46, 40), rng.uniform(-3.74, -3.66, 40)
+    minutes, traffic = (a.tolist() for a in _travel_stack(lats, lons, "Madrid", "weekend", 8))
+    for h in range(0, 24, 3):
+        for i, j in itertools.permutations(range(len(lats)), 2):
+            est = estimate_travel_time(lats[i], lons[i], lats[j], lons[j], "Madrid", h, "weekend", 8)
+            assert round(minutes[h][i][j], 1) == est["duration_minutes"], (h, i, j)
+            assert round(traffic[h][i][j], 3) == est["traffic_index"], (h, i, j)
+    print(f"  ✓ Unrounded stack agrees with estimate_travel_time over 40 random points")
+
+    # Held-Karp finds the quickest open path over the matrix
+    path = solve_tsp_held_karp(matrix, start_idx=0)
+    path_time = lambda p: sum(matrix[a][b] for a, b in zip(p, p[1:]))
+    brute = min(path_time((0,) + p) for p in itertools.permutations(range(1, len(matrix))))
+    assert sorted(path) == list(range(len(matrix))) and path[0] == 0
+    assert abs(path_time(path) - brute) < 1e-9, f"{path_time(path)} != {brute}"
+    print(f"  ✓ Held-Karp path {path}: {path_time(path):.1f} min")
+
+    # Branch and bound agrees without penalties and respects a late-arrival one
+    bb_path, bb_cost = branch_and_bound(matrix, start_idx=0)
+    assert abs(bb_cost - brute) < 1e-9, f"{bb_cost} != {brute}"
+    late = lambda node, arrival: 10.0 if node == path[-1] and arrival > 5 else 0.0
+    bb_path, bb_cost = branch_and_bound(matrix, late, start_idx=0)
+    penalized = lambda p: path_time(p) + sum(
+        late(b, path_time(p[:k + 2])) for k, b in enumerate(p[1:]))
+    assert abs(bb_cost - penalized(bb_path)) < 1e-9
+    assert abs(bb_cost - min(penalized((0,) + p)
+                             for p in itertools.permutations(range(1, len(matrix))))) < 1e-9
+    print(f"  ✓ Branch and bound path {bb_path}: {bb_cost:.1f}")
+
     print("\n  ALL TRAVEL ESTIMATOR TESTS PASSED ✓")
 
 
@@ -159,8 +301,7 @@ def test_optimizer_madrid():
     ds = get_data_store()
 
     # Pick 5 popular Madrid attractions
-    madrid = ds.get_attractions_by_city("Madrid")
-    top5 = sorted(madrid, key=lambda a: a["priority_score"], reverse=True)[:5]
+    top5 = ds.get_top_attractions("Madrid", limit=5)
     ids = [a["id"] for a in top5]
     print(f"  Attractions: {', '.join(a['name'] for a in top5)}")
 
@@ -229,8 +370,7 @@ def test_optimizer_barcelona():
 
     if len(selected) < 3:
         # Fallback to top by priority
-        selected = sorted(
-            bcn, key=lambda a: a["priority_score"], reverse=True)[:4]
+        selected = ds.get_top_attractions("Barcelona", limit=4)
 
     ids = [a["id"] for a in selected]
     print(f"  Attractions: {', '.join(a['name'] for a in selected)}")
@@ -260,8 +400,7 @@ def test_optimizer_seville():
     separator("TEST 6: Full Optimizer — Seville August (Extreme Heat)")
     ds = get_data_store()
 
-    sev = ds.get_attractions_by_city("Seville")
-    top4 = sorted(sev, key=lambda a: a["priority_score"], reverse=True)[:4]
+    top4 = ds.get_top_attractions("Seville", limit=4)
     ids = [a["id"] for a in top4]
     print(f"  Attractions: {', '.join(a['name'] for a in top4)}")
 
@@ -288,8 +427,7 @@ def test_preference_modes():
     separator("TEST 7: Preference Mode Comparison")
     ds = get_data_store()
 
-    madrid = ds.get_attractions_by_city("Madrid")
-    top4 = sorted(madrid, key=lambda a: a["priority_score"], reverse=True)[:4]
+    top4 = ds.get_top_attractions("Madrid", limit=4)
     ids = [a["id"] for a in top4]
 
     date = datetime(2025, 7, 15)
@@ -350,6 +488,29 @@ def test_edge_cases():
     print(
         f"  ✓ 3 attractions: 6 permutations, score={r.to_dict()['total_impact_score']:.4f}")
 
+    # Dropping all_scores leaves the result itself unchanged
+    lean = optimize_itinerary(40.42, -3.70, three_ids, "Madrid", date,
+                              keep_all_scores=False)
+    assert lean.all_scores == [] and len(r.all_scores) == 6
+    assert lean.timeline == r.timeline and lean.explanation == r.explanation
+    print(f"  ✓ keep_all_scores=False skips the per-route score list")
+
+    # Branch-and-bound pruning must pick the same route as the full search
+    six_ids = [a["id"] for a in madrid[:6]]
+    full = optimize_itinerary(40.42, -3.70, six_ids, "Madrid", date)
+    pruned = optimize_itinerary(40.42, -3.70, six_ids, "Madrid", date, prune=True)
+    assert pruned.timeline == full.timeline
+    assert pruned.permutations_evaluated <= full.permutations_evaluated == 720
+    print(
+        f"  ✓ Pruned search: same route, {pruned.permutations_evaluated}/720 routes completed")
+
+    # Splitting the search by first stop across an executor changes nothing
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        split = optimize_itinerary(40.42, -3.70, six_ids, "Madrid", date, executor=ex)
+    assert split.timeline == full.timeline and split.all_scores == full.all_scores
+    assert split.permutations_evaluated == 720
+    print(f"  ✓ Split search across an executor: same route and ranking")
+
     print("\n  ALL EDGE CASE TESTS PASSED ✓")
 
 
@@ -6,8 +6,14 @@ For MVP, uses haversine distance with city-specific speed adjustments.
 """
 
 import math
-from typing import Tuple
-from engine.data_loader import get_data_store, haversine_km
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from engine.data_loader import get_data_store, haversine_km, haversine_km_vec
+from engine._travel_kernels import (
+    _road_km_cosines, small_matrix_kernel, travel_matrix_kernel, travel_stack_kernel,
+)
 
 
 # Average driving speeds in km/h by city and congestion level
@@ -26,65 +32,163 @@ DETOUR_FACTORS = {
     "seville": 1.45,    # Narrow old-town streets
 }
 
+# The same parameters as id-indexed arrays: SPEEDS rows are
+# (free_flow, congested, avg) and follow CITY_ID, as does DETOUR.
+# Unknown cities use row 0 (Madrid), matching the dict defaults above.
+CITY_ID = {city: i for i, city in enumerate(BASE_SPEEDS)}
+SPEEDS = np.array([[s["free_flow"], s["congested"], s["avg"]] for s in BASE_SPEEDS.values()],
+                  dtype=np.float64)
+DETOUR = np.array([DETOUR_FACTORS[city] for city in CITY_ID], dtype=np.float64)
+_CITY_PARAMS = tuple(zip(SPEEDS[:, 0].tolist(), SPEEDS[:, 1].tolist(), DETOUR.tolist()))
 
-def estimate_travel_time(
+
+def city_params(city_lower: str) -> Tuple[float, float, float]:
+    """(free_flow, congested, detour) for a lower-cased city name, as plain floats."""
+    return _CITY_PARAMS[CITY_ID.get(city_lower, 0)]
+
+
+# ── Memoized Store Lookups ───────────────────────────────
+# Routes revisit the same few coordinates and (zone, hour) slots thousands of
+# times per request. Keys are exact, so results match the store's; call
+# reset_caches() after replacing or reloading the DataStore.
+
+@lru_cache(maxsize=4096)
+def _zone_for(city_lower: str, lat: float, lon: float) -> str:
+    return get_data_store().get_zone_for_coords(city_lower, lat, lon)
+
+
+@lru_cache(maxsize=4096)
+def _traffic_index(city_lower: str, zone: str, day_type: str, hour: int) -> float:
+    return get_data_store().get_traffic_index(city_lower, zone, day_type, hour)
+
+
+@lru_cache(maxsize=16)
+def _seasonal_multiplier(month: int) -> float:
+    return get_data_store().get_seasonal_multiplier(month)
+
+
+@dataclass(frozen=True, slots=True)
+class TrafficProfile:
+    """
+    Everything estimate_travel_time needs from the DataStore for one
+    (city, day_type, month): each zone's hourly traffic index and the
+    seasonal multiplier.
+    """
+    city: str
+    day_type: str
+    month: int
+    seasonal: float
+    hourly: Dict[str, Tuple[float, ...]]
+
+    def zone_hours(self, zone: str) -> Tuple[float, ...]:
+        # Unknown zones use Central, like DataStore.get_traffic_index
+        return self.hourly.get(zone) or self.hourly["Central"]
+
+    def traffic_index(self, zone: str, hour: int) -> float:
+        return self.zone_hours(zone)[hour % 24]
+
+
+@lru_cache(maxsize=256)
+def prepare_travel_context(city: str, day_type: str = "weekday", month: int = 6) -> TrafficProfile:
+    """TrafficProfile for a (city, day_type, month), built once and reused."""
+    store = get_data_store()
+    return TrafficProfile(
+        city=city.lower(),
+        day_type=day_type,
+        month=month,
+        seasonal=store.get_seasonal_multiplier(month),
+        hourly=store.get_traffic_profiles(city, day_type),
+    )
+
+
+def reset_caches():
+    """Clear the memoized zone, traffic and seasonal lookups and traffic profiles."""
+    for cached in (_zone_for, _traffic_index, _seasonal_multiplier, prepare_travel_context):
+        cached.cache_clear()
+
+
+def _estimate_core(
     origin_lat: float, origin_lon: float,
     dest_lat: float, dest_lon: float,
-    city: str,
+    city_lower: str,
     hour: int,
-    day_type: str = "weekday",
-    month: int = 6,
-) -> dict:
+    day_type: str,
+    month: int,
+    ctx: Optional[TrafficProfile],
+) -> Tuple[float, float, float, str, str]:
     """
-    Estimate driving time between two points.
-
-    Returns:
-        dict with:
-            - distance_km: estimated road distance
-            - duration_minutes: estimated travel time
-            - traffic_index: congestion level used (0-1)
-            - speed_kmh: effective speed used
-            - free_flow_minutes: time without traffic
+    Steps 1-5 of estimate_travel_time, unrounded:
+    (road_km, traffic_index, effective_speed, origin_zone, dest_zone).
     """
-    store = get_data_store()
-    city_lower = city.lower()
+    free_flow, congested, detour = city_params(city_lower)
 
     # 1. Compute straight-line distance
     straight_km = haversine_km(origin_lat, origin_lon, dest_lat, dest_lon)
 
     # 2. Apply detour factor for road distance
-    detour = DETOUR_FACTORS.get(city_lower, 1.35)
     road_km = straight_km * detour
 
     # Minimum distance (even adjacent attractions have some travel)
     road_km = max(road_km, 0.3)
 
     # 3. Get traffic congestion for this time
-    origin_zone = store.get_zone_for_coords(city, origin_lat, origin_lon)
-    dest_zone = store.get_zone_for_coords(city, dest_lat, dest_lon)
+    origin_zone = _zone_for(city_lower, origin_lat, origin_lon)
+    dest_zone = _zone_for(city_lower, dest_lat, dest_lon)
 
     # Use average of origin and destination zone congestion
-    traffic_origin = store.get_traffic_index(city, origin_zone, day_type, hour)
-    traffic_dest = store.get_traffic_index(city, dest_zone, day_type, hour)
+    if ctx is None:
+        traffic_origin = _traffic_index(city_lower, origin_zone, day_type, hour)
+        traffic_dest = _traffic_index(city_lower, dest_zone, day_type, hour)
+        seasonal_mult = _seasonal_multiplier(month)
+    else:
+        traffic_origin = ctx.traffic_index(origin_zone, hour)
+        traffic_dest = ctx.traffic_index(dest_zone, hour)
+        seasonal_mult = ctx.seasonal
     traffic_index = (traffic_origin + traffic_dest) / 2
 
     # 4. Apply seasonal adjustment
-    seasonal_mult = store.get_seasonal_multiplier(month)
     traffic_index = min(traffic_index * seasonal_mult, 1.0)
 
     # 5. Compute effective speed
-    speeds = BASE_SPEEDS.get(city_lower, BASE_SPEEDS["madrid"])
-    free_flow = speeds["free_flow"]
-    congested = speeds["congested"]
-
     # Linear interpolation between free-flow and congested speeds
     effective_speed = free_flow - (free_flow - congested) * traffic_index
     effective_speed = max(effective_speed, congested * 0.7)  # Floor
 
+    return road_km, traffic_index, effective_speed, origin_zone, dest_zone
+
+
+def estimate_travel_time(
+    origin_lat: float, origin_lon: float,
+    dest_lat: float, dest_lon: float,
+    city: str,
+    hour: int,
+    day_type: str = "weekday",
+    month: int = 6,
+    ctx: Optional[TrafficProfile] = None,
+) -> dict:
+    """
+    Estimate driving time between two points.
+
+    Pass `ctx` (from prepare_travel_context for this city, day_type and
+    month) when estimating many trips for one day; traffic then comes
+    straight from its tables.
+
+    Returns:
+        dict with:
+            - distance_km: estimated road distance
+            - duration_minutes: estimated travel time
+            - traffic_index: congestion level used (0-1)
+            - speed_kmh: effective speed used
+            - free_flow_minutes: time without traffic
+    """
+    city_lower = city.lower()
+    road_km, traffic_index, effective_speed, origin_zone, dest_zone = _estimate_core(
+        origin_lat, origin_lon, dest_lat, dest_lon, city_lower, hour, day_type, month, ctx)
+
     # 6. Compute travel time
     duration_hours = road_km / effective_speed
     duration_minutes = round(duration_hours * 60, 1)
-    free_flow_minutes = round((road_km / free_flow) * 60, 1)
+    free_flow_minutes = round((road_km / city_params(city_lower)[0]) * 60, 1)
 
     return {
         "distance_km": round(road_km, 2),
@@ -97,8 +201,76 @@ def estimate_travel_time(
     }
 
 
+def travel_minutes(
+    origin_lat: float, origin_lon: float,
+    dest_lat: float, dest_lon: float,
+    city: str,
+    hour: int,
+    day_type: str = "weekday",
+    month: int = 6,
+    ctx: Optional[TrafficProfile] = None,
+) -> float:
+    """estimate_travel_time(...)["duration_minutes"] without building the result dict."""
+    road_km, _, effective_speed, _, _ = _estimate_core(
+        origin_lat, origin_lon, dest_lat, dest_lon, city.lower(), hour, day_type, month, ctx)
+    return round(road_km / effective_speed * 60, 1)
+
+
+def estimate_travel_time_batch(
+    origin_lats, origin_lons,
+    dest_lats, dest_lons,
+    city: str,
+    hour: int,
+    day_type: str = "weekday",
+    month: int = 6,
+) -> np.ndarray:
+    """
+    Vectorized duration_minutes for many origin → destination pairs at one hour.
+    Same model as estimate_travel_time, computed with NumPy over whole arrays.
+
+    Returns:
+        float array of travel times in minutes (rounded to 0.1), one per pair
+    """
+    store = get_data_store()
+    city_lower = city.lower()
+    o_lat, o_lon, d_lat, d_lon = (np.asarray(x, dtype=float)
+                                  for x in (origin_lats, origin_lons, dest_lats, dest_lons))
+
+    detour = DETOUR[CITY_ID.get(city_lower, 0)]
+    road_km = np.maximum(haversine_km_vec(o_lat, o_lon, d_lat, d_lon) * detour, 0.3)
+
+    # Zones for every endpoint in one vectorized pass, then traffic per zone
+    zones = store.get_zones_for_coords(
+        city, np.concatenate([o_lat, d_lat]), np.concatenate([o_lon, d_lon]))
+    traffic_by_zone = {z: _traffic_index(city_lower, z, day_type, hour) for z in set(zones)}
+    traffic = np.array([traffic_by_zone[z] for z in zones])
+    traffic_o, traffic_d = traffic[:o_lat.size], traffic[o_lat.size:]
+    seasonal_mult = _seasonal_multiplier(month)
+    traffic_index = np.minimum((traffic_o + traffic_d) / 2 * seasonal_mult, 1.0)
+
+    return _duration_minutes(road_km, traffic_index, city_lower)
+
+
+def _location_columns(locations) -> Tuple[np.ndarray, np.ndarray]:
+    """float64 latitude and longitude columns from dicts or a (lats, lons) pair."""
+    if isinstance(locations, tuple):
+        lats, lons = locations
+        return np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+    return (np.array([loc["latitude"] for loc in locations], dtype=np.float64),
+            np.array([loc["longitude"] for loc in locations], dtype=np.float64))
+
+
+def _duration_minutes(road_km: np.ndarray, traffic_index: np.ndarray, city_lower: str) -> np.ndarray:
+    """Steps 5-6 of estimate_travel_time over arrays: minutes, rounded to 0.1."""
+    free_flow, congested, _ = city_params(city_lower)
+    effective_speed = np.maximum(
+        free_flow - (free_flow - congested) * traffic_index, congested * 0.7)
+
+    return np.round(road_km / effective_speed * 60, 1)
+
+
 def estimate_travel_matrix(
-    locations: list,
+    locations,
     city: str,
     hour: int,
     day_type: str = "weekday",
@@ -108,23 +280,142 @@ def estimate_travel_matrix(
     Compute travel time matrix for a list of locations.
 
     Args:
-        locations: list of dicts with 'latitude' and 'longitude'
+        locations: list of dicts with 'latitude' and 'longitude', or a
+            (latitudes, longitudes) pair of arrays such as DataStore.coords_of returns
 
     Returns:
         2D list where matrix[i][j] = travel time in minutes from i to j
     """
-    n = len(locations)
-    matrix = [[0.0] * n for _ in range(n)]
+    lats, lons = _location_columns(locations)
+    if not lats.size:
+        return []
+    store = get_data_store()
+    city_lower = city.lower()
+
+    # One zone and traffic lookup per location; the kernel averages each pair
+    traffic = [
+        _traffic_index(city_lower, zone, day_type, hour)
+        for zone in store.get_zones_for_coords(city, lats, lons)
+    ]
+    free_flow, congested, detour = city_params(city_lower)
+    seasonal_mult = _seasonal_multiplier(month)
+
+    small_kernel = small_matrix_kernel(lats.size)
+    if small_kernel is not None:
+        return small_kernel(lats.tolist(), lons.tolist(), traffic,
+                            seasonal_mult, free_flow, congested, detour)
+    matrix = np.round(travel_matrix_kernel(
+        lats, lons, traffic, seasonal_mult, free_flow, congested, detour), 1)
+    np.fill_diagonal(matrix, 0.0)
+    return matrix.tolist()
+
+
+def estimate_travel_matrix_with_lb(
+    locations,
+    city: str,
+    hour: int,
+    day_type: str = "weekday",
+    month: int = 6,
+) -> Tuple[list, list]:
+    """
+    estimate_travel_matrix plus a lower bound on every entry: free-flow
+    minutes over the same road distance (no traffic level drives faster),
+    rounded down to 0.1 so it stays below the rounded durations.
+
+    Returns:
+        (duration matrix, lower-bound matrix) as 2D lists
+    """
+    duration = estimate_travel_matrix(locations, city, hour, day_type, month)
+    lats, lons = _location_columns(locations)
+    if not lats.size:
+        return duration, []
+    free_flow, _, detour = city_params(city.lower())
+    lower = _road_km_cosines(lats, lons, detour) / free_flow * 60
+    # Slack covers the kernels' micrometre-level distance differences
+    lower = np.floor(lower * 10 - 1e-6) / 10
+    np.fill_diagonal(lower, 0.0)
+    return duration, lower.tolist()
+
+
+def _travel_stack(lats, lons, city: str, day_type: str = "weekday", month: int = 6):
+    """
+    Unrounded (minutes, traffic_index) arrays of shape (24, n, n) for every
+    departure hour and origin → destination pair of the given coordinates.
+    """
+    city_lower = city.lower()
+    ctx = prepare_travel_context(city, day_type, month)
+    zones = get_data_store().get_zones_for_coords(city, lats, lons)
+    traffic_by_hour = np.array([ctx.zone_hours(zone) for zone in zones], dtype=np.float64).T
+    free_flow, congested, detour = city_params(city_lower)
+    return travel_stack_kernel(
+        lats, lons, traffic_by_hour, ctx.seasonal, free_flow, congested, detour)
+
+
+def estimate_travel_time_stack(
+    locations,
+    city: str,
+    day_type: str = "weekday",
+    month: int = 6,
+) -> np.ndarray:
+    """
+    Travel time matrices for all 24 departure hours in one pass.
+
+    Args:
+        locations: as for estimate_travel_matrix
+
+    Returns:
+        (24, n, n) array where stack[hour, i, j] = estimate_travel_matrix(..., hour)[i][j]
+    """
+    lats, lons = _location_columns(locations)
+    n = lats.size
+    if not n:
+        return np.zeros((24, 0, 0))
+    stack = np.round(_travel_stack(lats, lons, city, day_type, month)[0], 1)
+    stack[:, np.arange(n), np.arange(n)] = 0.0
+    return stack
 
-    for i in range(n):
-        for j in range(n):
-            if i == j:
+
+def solve_tsp_held_karp(matrix, start_idx: int = 0) -> List[int]:
+    """
+    Quickest open path through every location of a travel-time matrix,
+    starting at `start_idx`, by Held-Karp dynamic programming: O(n²·2ⁿ)
+    work instead of (n-1)! orderings.
+
+    The matrix is one hour's travel times, so this minimizes driving time
+    only; the optimizer's time-dependent impact score still needs its search.
+
+    Returns:
+        location indices in visiting order, beginning with start_idx
+    """
+    cost = np.asarray(matrix, dtype=np.float64)
+    n = cost.shape[0]
+    if n == 0:
+        return []
+    columns = np.arange(n)
+    # dp[mask, last]: quickest path from start_idx through `mask`, ending at `last`
+    dp = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    dp[1 << start_idx, start_idx] = 0.0
+
+    for mask in range(1 << n):
+        row = dp[mask]
+        if not np.isfinite(row).any():
+            continue
+        extended = row[:, None] + cost          # [last, next]
+        via = extended.argmin(axis=0)
+        best = extended[via, columns]
+        for nxt in range(n):
+            if mask >> nxt & 1:
                 continue
-            result = estimate_travel_time(
-                locations[i]["latitude"], locations[i]["longitude"],
-                locations[j]["latitude"], locations[j]["longitude"],
-                city, hour, day_type, month
-            )
-            matrix[i][j] = result["duration_minutes"]
-
-    return matrix
+            target = mask | (1 << nxt)
+            if best[nxt] < dp[target, nxt]:
+                dp[target, nxt] = best[nxt]
+                parent[target, nxt] = via[nxt]
+
+    mask = (1 << n) - 1
+    last = int(dp[mask].argmin())
+    path = []
+    while last >= 0:
+        path.append(last)
+        mask, last = mask ^ (1 << last), int(parent[mask, last])
+    return path[::-1]
@@ -0,0 +1,115 @@
+"""
+SmartTrip AI - Branch-and-Bound Route Search
+Best-first branch and bound for open paths over a travel-time matrix, where
+each arrival may also carry a time-dependent penalty (which rules out plain
+Held-Karp). Partial paths whose cost plus lower bound cannot beat the best
+complete path are never expanded.
+"""
+
+import heapq
+import math
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+# time_penalty_fn(node, arrival_minutes) -> non-negative extra cost of arriving
+# at `node` that many minutes after leaving the start
+TimePenalty = Callable[[int, float], float]
+
+
+def _no_penalty(node: int, arrival_minutes: float) -> float:
+    return 0.0
+
+
+def _path_cost(cost: np.ndarray, path: List[int], time_penalty_fn: TimePenalty) -> float:
+    total = elapsed = 0.0
+    for a, b in zip(path, path[1:]):
+        elapsed += cost[a, b]
+        total += cost[a, b] + time_penalty_fn(b, elapsed)
+    return total
+
+
+def nearest_neighbor_tour(matrix, start_idx: int = 0) -> List[int]:
+    """Greedy open path: from start_idx, always drive to the closest unvisited location."""
+    cost = np.asarray(matrix, dtype=np.float64)
+    path = [start_idx]
+    unvisited = set(range(cost.shape[0])) - {start_idx}
+    while unvisited:
+        here = path[-1]
+        nxt = min(unvisited, key=lambda j: (cost[here, j], j))
+        path.append(nxt)
+        unvisited.remove(nxt)
+    return path
+
+
+def _remaining_lower_bound(cost: np.ndarray, last: int, unvisited: List[int]) -> float:
+    """
+    Every unvisited location is still entered exactly once, from `last` or
+    another unvisited location, so the sum of those cheapest entering edges
+    bounds the rest of an open path from below. Penalties are non-negative
+    and add nothing to the bound.
+    """
+    if not unvisited:
+        return 0.0
+    sources = [last] + unvisited
+    block = cost[np.ix_(sources, unvisited)].copy()
+    # An edge may not enter the location it leaves
+    block[np.arange(1, len(sources)), np.arange(len(unvisited))] = np.inf
+    return float(block.min(axis=0).sum())
+
+
+def branch_and_bound(
+    matrix,
+    time_penalty_fn: Optional[TimePenalty] = None,
+    start_idx: int = 0,
+    upper_bound: Optional[float] = None,
+) -> Tuple[List[int], float]:
+    """
+    Cheapest open path through every location, starting at start_idx.
+
+    A path's cost is its travel time plus time_penalty_fn(node, arrival) for
+    every location after the start. The nearest-neighbor path seeds the
+    incumbent; `upper_bound`, if tighter, prunes further.
+
+    Returns:
+        (path, cost); ([], inf) if no path costs less than upper_bound
+    """
+    cost = np.asarray(matrix, dtype=np.float64)
+    n = cost.shape[0]
+    if n == 0:
+        return [], 0.0
+    penalty = time_penalty_fn or _no_penalty
+
+    best_path = nearest_neighbor_tour(cost, start_idx)
+    best_cost = _path_cost(cost, best_path, penalty)
+    if upper_bound is not None and upper_bound < best_cost:
+        best_path, best_cost = [], upper_bound
+
+    # Entries: (cost + lower bound, -depth, path, cost, elapsed). Deeper
+    # paths pop first on ties so complete paths tighten the incumbent early.
+    everyone = range(n)
+    root_rest = [j for j in everyone if j != start_idx]
+    heap = [(_remaining_lower_bound(cost, start_idx, root_rest), -1, (start_idx,), 0.0, 0.0)]
+    while heap:
+        bound, _, path, path_cost, elapsed = heapq.heappop(heap)
+        if bound >= best_cost:
+            break  # every remaining entry is bounded at least as high
+        if len(path) == n:
+            best_path, best_cost = list(path), path_cost
+            continue
+        last = path[-1]
+        visited = set(path)
+        for nxt in everyone:
+            if nxt in visited:
+                continue
+            arrival = elapsed + cost[last, nxt]
+            child_cost = path_cost + cost[last, nxt] + penalty(nxt, arrival)
+            rest = [j for j in everyone if j not in visited and j != nxt]
+            child_bound = child_cost + _remaining_lower_bound(cost, nxt, rest)
+            if child_bound < best_cost:
+                heapq.heappush(heap, (child_bound, -len(path) - 1, path + (nxt,), child_cost, arrival))
+
+    if not best_path:
+        return [], math.inf
+    return best_path, best_cost